@@ -1,8 +1,17 @@
+import hashlib
+import inspect
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas_flavor as pf
 import pandas as pd
 import numpy as np
-import matplotlib as plt
+import matplotlib
+import matplotlib.pyplot as plt
 import seaborn as sns
+from matplotlib.figure import Figure
 
 
 @pf.register_dataframe_method
@@ -56,7 +65,7 @@ def bullet_graph(
                 
 
             Returns:
-                Matplot Chart object
+                Matplotlib Figure
         """
 
          # Convert dataframe to a list of tuples for code to run.
@@ -90,12 +99,10 @@ def bullet_graph(
             ax.spines['right'].set_visible(False)
             ax.spines['left'].set_visible(False)
 
-            prev_limit = 0
-            for idx2, lim in enumerate(limits):
-                # Draw the bar
-                ax.barh([1], lim - prev_limit, left=prev_limit, height=h,
-                        color=palette[idx2])
-                prev_limit = lim
+            # Draw all the qualitative range bands in one call
+            lefts = [0] + list(limits[:-1])
+            widths = [lim - left for lim, left in zip(limits, lefts)]
+            ax.barh([1] * len(limits), widths, left=lefts, height=h, color=palette)
             rects = ax.patches
             # The last item in the list is the value we're measuring
             # Draw the value we're measuring
@@ -124,9 +131,9 @@ def bullet_graph(
             ax.set_xlabel(axis_label)
         if title:
             fig.suptitle(title, fontsize=14)
-        g = fig.subplots_adjust(hspace=0)
+        fig.subplots_adjust(hspace=0)
 
-        return g
+        return fig
 
 @pf.register_dataframe_method
 def funnel_graph(
@@ -167,7 +174,7 @@ def funnel_graph(
                 fill_color: Fill color
                 
             Returns:
-                Matplot Chart object
+                Matplotlib Figure
     """
 
     x_list = df[x_axis_column].values.tolist()
@@ -192,10 +199,11 @@ def funnel_graph(
                 
             shadow_y = [y[idx]-0.4, y[idx+1]+0.4, y[idx+1]+0.4, y[idx]-0.4, y[idx]-0.4]
             plt.fill(shadow_x, shadow_y, color=fill_color, alpha=0.6)
-        plt.xlim(xmin, xmax)
-        plt.axis('off')
-        plt.title(title, loc='center', fontsize=24, color=text_color)
-        plt.show()
+    plt.xlim(xmin, xmax)
+    plt.axis('off')
+    plt.title(title, loc='center', fontsize=24, color=text_color)
+
+    return fig
 
 @pf.register_dataframe_method
 def dot_plot(df, sort_column, x_axis_column, y_axis_column, x_label, y_label, column_titles, xlim=(0, 25)):
@@ -223,21 +231,190 @@ def dot_plot(df, sort_column, x_axis_column, y_axis_column, x_label, y_label, co
 
     return g
 
+def _bin_labels(s, max_bins):
+    # Map each label to one of at most max_bins contiguous blocks, in the order pivot_table sorts them,
+    # so the pivot aggregates raw rows per block. Blocks are labelled first..last.
+    labels = s.groupby(s, observed=True).size().index
+    if len(labels) <= max_bins:
+        return s
+
+    block = int(np.ceil(len(labels) / max_bins))
+    block_labels = [
+        f'{labels[i]}..{labels[min(i + block, len(labels)) - 1]}' for i in range(0, len(labels), block)
+    ]
+    codes = labels.get_indexer(s)
+    return pd.Categorical.from_codes(np.where(codes >= 0, codes // block, -1), categories=block_labels)
+
 @pf.register_dataframe_method
 def heatmap(
     df: pd.DataFrame,
       index_column: str, 
       columns: str,  
-      values_columns: str 
+      values_columns: str,
+      aggfunc: str = 'sum',
+      max_bins: int = 500,
+      raster_threshold: int = 10000,
+      annot_threshold: int = 400,
+      cmap: str = None,
+      size: tuple = (9, 6)
     ):
+    """Create a heatmap from long format data, aggregating duplicate index/column pairs.
+
+        Axes longer than max_bins are merged into contiguous bins. Small matrices are drawn as an
+        annotated seaborn heatmap, larger ones as a single raster image without annotations.
+
+        Examples:
+            Functional usage
+
+            >>> import pandas as pd
+            >>> from bizwiz import charter
+            >>> df.heatmap(
+            ... index_column = 'store', 
+            ... columns = 'week', 
+            ... values_columns = 'sales', 
+            ... aggfunc = 'mean'
+            ... )  # doctest: +SKIP
+
+
+        Args:
+            df: dataframe containing chart data
+            index_column: Column name for the heatmap rows
+            columns: Column name for the heatmap columns
+            values_columns: Column name of the cell values
+            aggfunc: Aggregation applied to the rows of each cell, binned cells included. Default is sum.
+            max_bins: Maximum rows and columns drawn before contiguous labels are binned. Default is 500.
+            raster_threshold: Cell count above which the matrix is drawn as a raster image. Default is 10,000.
+            annot_threshold: Cell count up to which values are written in each cell. Default is 400.
+            cmap: Matplotlib colormap name. Default is None (seaborn default).
+            size: Size of chart
+
+        Returns:
+            Matplotlib Axes
+    """
 
-    df = df.pivot(index=index_column, columns=columns, values=values_columns)
-    #Draw heatmap with numeric values in each cell
-    f, ax = plt.subplots(figsize=(9,6))
-    hm = sns.heatmap(df, annot=True, fmt='d', linewidth=.5, ax=ax)
+    df = df.assign(**{
+        index_column: _bin_labels(df[index_column], max_bins),
+        columns: _bin_labels(df[columns], max_bins)
+    })
+    matrix = df.pivot_table(index=index_column, columns=columns, values=values_columns, aggfunc=aggfunc, observed=True)
+    cells = matrix.size
+
+    f, ax = plt.subplots(figsize=size)
+
+    if cells > raster_threshold:
+        image = ax.imshow(matrix.to_numpy(dtype=float), aspect='auto', interpolation='nearest', cmap=cmap or 'rocket')
+        f.colorbar(image, ax=ax)
+
+        # Label a readable subset of the ticks
+        yticks = np.linspace(0, len(matrix.index) - 1, min(len(matrix.index), 20)).astype(int)
+        xticks = np.linspace(0, len(matrix.columns) - 1, min(len(matrix.columns), 12)).astype(int)
+        ax.set_yticks(yticks, [str(matrix.index[i]) for i in yticks])
+        ax.set_xticks(xticks, [str(matrix.columns[i]) for i in xticks], rotation=90)
+
+        ax.set_ylabel(index_column)
+        ax.set_xlabel(columns)
+        return ax
+
+    # Draw heatmap with numeric values in each cell while the matrix is small enough to read
+    values = matrix.to_numpy(dtype=float)
+    integers = np.allclose(values[~np.isnan(values)], np.round(values[~np.isnan(values)]))
+    hm = sns.heatmap(
+        matrix, 
+        annot=cells <= annot_threshold, 
+        fmt='.0f' if integers else '.2g', 
+        linewidth=.5 if cells <= annot_threshold else 0, 
+        cmap=cmap, 
+        ax=ax
+    )
 
     return hm
 
+def _lttb(x, y, n_out):
+    # Largest-Triangle-Three-Buckets: keep the point in each bucket forming the largest triangle with the
+    # previously kept point and the average of the next bucket. Returns the positions of the kept points.
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area)) if end > start else start
+        selected[i + 1] = a
+
+    return selected
+
+def _minmax(x, y, n_out):
+    # Keep the minimum and maximum of each bucket plus the end points
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+
+    buckets = np.arange(n) * max(n_out // 2, 1) // n
+    grouped = pd.Series(y).groupby(buckets)
+    return np.unique(np.concatenate([grouped.idxmin().to_numpy(), grouped.idxmax().to_numpy(), [0, n - 1]]))
+
+def downsample_timeseries(
+    df: pd.DataFrame, 
+    x_axis_column: str, 
+    y_axis_column: str, 
+    group_columns: list = None, 
+    n_out: int = 1000, 
+    method: str = 'lttb'
+) -> pd.DataFrame:
+    """Reduce each series to about n_out points while preserving its visual shape.
+
+        Examples:
+            Functional usage
+
+            >>> import pandas as pd
+            >>> from bizwiz import charter
+            >>> small = charter.downsample_timeseries(
+            ... df, 
+            ... x_axis_column = 'timestamp', 
+            ... y_axis_column = 'value', 
+            ... group_columns = ['sensor'], 
+            ... n_out = 600
+            ... )  # doctest: +SKIP
+
+
+        Args:
+            df: dataframe containing the series
+            x_axis_column: Column name of the x axis. Numeric or datetime.
+            y_axis_column: Column name of the y axis values
+            group_columns: Column names identifying each series. Default is None (one series).
+            n_out: Target number of points per series. Default is 1000.
+            method: lttb (Largest-Triangle-Three-Buckets) or minmax (min and max per bucket). Default is lttb.
+
+        Returns:
+            DataFrame with the retained rows of each series, sorted by x within each series
+    """
+    samplers = {'lttb': _lttb, 'minmax': _minmax}
+    sampler = samplers[method]
+
+    df = df.dropna(subset=[x_axis_column, y_axis_column])
+    groups = df.groupby(group_columns).indices.values() if group_columns else [np.arange(len(df))]
+    kept = []
+
+    for positions in groups:
+        series = df.iloc[positions].sort_values(x_axis_column)
+        x = series[x_axis_column]
+        x = (x.astype('int64') if pd.api.types.is_datetime64_any_dtype(x) else x).to_numpy(dtype=float)
+        y = series[y_axis_column].to_numpy(dtype=float)
+        kept.append(series.iloc[sampler(x, y, n_out)])
+
+    return pd.concat(kept) if kept else df
+
 @pf.register_dataframe_method
 def multi_timeseries(
     df: pd.DataFrame, 
@@ -246,8 +423,51 @@ def multi_timeseries(
     hue: str, 
     facet_column: str = None, 
     x_label: str = '', 
-    y_label: str = ''
+    y_label: str = '',
+    downsample: str = 'lttb',
+    points_per_pixel: float = 1.0,
+    dpi: int = 100
 ):
+    """Create faceted line charts with every series drawn in grey behind each facet.
+
+        Each series is downsampled per facet before plotting so render time follows the output size
+        rather than the number of input rows.
+
+        Examples:
+            Functional usage
+
+            >>> import pandas as pd
+            >>> from bizwiz import charter
+            >>> df.multi_timeseries(
+            ... x_axis_column = 'timestamp', 
+            ... y_axis_column = 'value', 
+            ... hue = 'sensor', 
+            ... facet_column = 'sensor'
+            ... )  # doctest: +SKIP
+
+
+        Args:
+            df: dataframe containing chart data
+            x_axis_column: Column name of the x axis
+            y_axis_column: Column name of the y axis
+            hue: Column name identifying each series
+            facet_column: Column name to facet by. Default is None.
+            x_label: X axis label
+            y_label: Y axis label
+            downsample: lttb, minmax or None to plot every point. Default is lttb.
+            points_per_pixel: Points kept per horizontal pixel of each facet. Default is 1.0.
+            dpi: Resolution used to size the downsampling target. Default is 100.
+
+        Returns:
+            Seaborn FacetGrid
+    """
+    height = 2
+    aspect = 1.5
+
+    if downsample is not None:
+        n_out = max(int(height * aspect * dpi * points_per_pixel), 3)
+        group_columns = list(dict.fromkeys(c for c in (hue, facet_column) if c is not None))
+        df = downsample_timeseries(df, x_axis_column, y_axis_column, group_columns, n_out, downsample)
 
     g = sns.relplot(
         data = df,
@@ -260,14 +480,14 @@ def multi_timeseries(
         linewidth = 4,
         zorder = 5,
         col_wrap = 3,
-        height = 2,
-        aspect = 1.5,
+        height = height,
+        aspect = aspect,
         legend = False
     )
 
-    for hue, ax in g.axes_dict.items():
+    for facet_value, ax in g.axes_dict.items():
             
-        ax.text(.8, .85, hue, transform = ax.transAxes, fontweight='bold')
+        ax.text(.8, .85, facet_value, transform = ax.transAxes, fontweight='bold')
 
         sns.lineplot(
             data=df, 
@@ -286,3 +506,250 @@ def multi_timeseries(
     g.tight_layout()
     
     return g
+
+
+_PLOTS = {
+    'bullet_graph': bullet_graph,
+    'funnel_graph': funnel_graph,
+    'dot_plot': dot_plot,
+    'heatmap': heatmap,
+    'multi_timeseries': multi_timeseries,
+}
+
+def _figure_of(result):
+    # Plot functions return a Figure, an Axes or a seaborn grid
+    if isinstance(result, Figure):
+        return result
+    if hasattr(result, 'figure'):
+        return result.figure
+    return plt.gcf()
+
+def _init_render_worker():
+    matplotlib.use('Agg')
+
+class RenderCache:
+    """On-disk cache of rendered charts keyed on a hash of the input columns and plotting parameters.
+
+        Files are evicted least recently used first once the cache grows past max_bytes. Hits are
+        served straight from disk without calling matplotlib.
+
+        Examples:
+            Functional usage
+
+            >>> from bizwiz import charter
+            >>> cache = charter.RenderCache('.chart_cache', max_bytes=256 * 1024 ** 2)
+            >>> png = charter.render_cached(
+            ... df, 
+            ... plot = 'funnel_graph', 
+            ... cache = cache, 
+            ... x_axis_column = 'value1', 
+            ... label_column = 'category'
+            ... )  # doctest: +SKIP
+
+        Args:
+            cache_dir: Directory the rendered images are stored in. Default is .charter_cache.
+            max_bytes: Maximum total size of the cache. Default is 512MB.
+    """
+
+    def __init__(self, cache_dir='.charter_cache', max_bytes=512 * 1024 ** 2):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, plot, df, file_format, dpi, plot_kwargs):
+        # Built-in plots only read the columns named in their arguments, so only those feed the hash. Other
+        # plot functions may read any column, so the whole frame is hashed.
+        columns = list(df.columns)
+        if isinstance(plot, str) or plot in _PLOTS.values():
+            names = [v for v in plot_kwargs.values() if isinstance(v, str)]
+            names += [c for v in plot_kwargs.values() if isinstance(v, (list, tuple)) for c in v if isinstance(c, str)]
+            columns = [c for c in dict.fromkeys(names) if c in df.columns] or columns
+
+        digest = hashlib.sha256()
+        digest.update(repr((getattr(plot, '__name__', plot), file_format, dpi, columns)).encode())
+        digest.update(repr(sorted((k, repr(v)) for k, v in plot_kwargs.items())).encode())
+        digest.update(pd.util.hash_pandas_object(df[columns], index=False).to_numpy().tobytes())
+
+        return f'{digest.hexdigest()}.{file_format}'
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+
+        # Touch the file so eviction treats it as recently used; it may already have been evicted
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return data
+
+    def put(self, key, data):
+        temp_path = f'{self.path(key)}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, self.path(key))
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        for name in os.listdir(self.cache_dir):
+            os.remove(os.path.join(self.cache_dir, name))
+
+def _render_image(plot, df, file_format, dpi, plot_kwargs):
+    plot_func = _PLOTS[plot] if isinstance(plot, str) else plot
+    open_figures = set(plt.get_fignums())
+    buffer = io.BytesIO()
+    try:
+        fig = _figure_of(plot_func(df, **plot_kwargs))
+        fig.savefig(buffer, format=file_format, dpi=dpi)
+    finally:
+        # Close only the figures this render created, leaving the caller's own figures open
+        for number in set(plt.get_fignums()) - open_figures:
+            plt.close(number)
+    return buffer.getvalue()
+
+def render_cached(
+    df: pd.DataFrame,
+    plot,
+    cache: RenderCache = None,
+    file_format: str = 'png',
+    dpi: int = 100,
+    **plot_kwargs
+) -> bytes:
+    """Render a chart to PNG or SVG bytes, reusing a cached image when the data and parameters are unchanged.
+
+        Args:
+            df: dataframe containing chart data
+            plot: Name of a charter plot (bullet_graph, funnel_graph, dot_plot, heatmap, multi_timeseries) or a module level plot function
+            cache: RenderCache to use. Default is None (the shared render_cache).
+            file_format: png or svg. Default is png.
+            dpi: Output resolution. Default is 100.
+            **plot_kwargs: Passed through to the plot function
+
+        Returns:
+            Image file contents
+    """
+    cache = _default_render_cache() if cache is None else cache
+    key = cache.key(plot, df, file_format, dpi, plot_kwargs)
+
+    data = cache.get(key)
+    if data is None:
+        data = _render_image(plot, df, file_format, dpi, plot_kwargs)
+        cache.put(key, data)
+
+    return data
+
+_render_cache = None
+
+def _default_render_cache():
+    global _render_cache
+    if _render_cache is None:
+        _render_cache = RenderCache()
+    return _render_cache
+
+def _render_group(plot, key, group, path, file_format, dpi, plot_kwargs, cache):
+    plot_func = _PLOTS[plot] if isinstance(plot, str) else plot
+    plot_kwargs = dict(plot_kwargs)
+
+    if 'title' in inspect.signature(plot_func).parameters and 'title' not in plot_kwargs:
+        plot_kwargs['title'] = str(key)
+
+    if cache is not None:
+        data = render_cached(group, plot, cache, file_format, dpi, **plot_kwargs)
+    else:
+        data = _render_image(plot, group, file_format, dpi, plot_kwargs)
+
+    with open(path, 'wb') as f:
+        f.write(data)
+
+    return path
+
+def render_groups(
+    df: pd.DataFrame,
+    group_column: str,
+    plot,
+    output_directory: str,
+    file_format: str='png',
+    max_workers: int=None,
+    dpi: int=100,
+    cache: RenderCache=None,
+    **plot_kwargs
+) -> dict:
+    """Render one chart per group to image files across a process pool using the Agg backend.
+
+        Examples:
+            Functional usage
+
+            >>> import pandas as pd
+            >>> from bizwiz import charter
+            >>> paths = charter.render_groups(
+            ... df, 
+            ... group_column = 'region', 
+            ... plot = 'bullet_graph', 
+            ... output_directory = 'charts', 
+            ... category_column = 'category', 
+            ... category_value_column = 'category_val', 
+            ... target_value_column = 'target_val'
+            ... )  # doctest: +SKIP
+
+
+        Args:
+            df: dataframe containing chart data for every group
+            group_column: Column name to split the charts by
+            plot: Name of a charter plot (bullet_graph, funnel_graph, dot_plot, heatmap, multi_timeseries) or a module level plot function
+            output_directory: Directory the images are written to
+            file_format: png or svg. Default is png.
+            max_workers: Number of worker processes. Default is None (one per CPU).
+            dpi: Output resolution. Default is 100.
+            cache: RenderCache to reuse unchanged charts from. Default is None (always render).
+            **plot_kwargs: Passed through to the plot function. The group value is used as the title unless one is given.
+
+        Returns:
+            Dictionary of group value to image path
+    """
+    os.makedirs(output_directory, exist_ok=True)
+    groups = df.groupby(group_column).indices
+    paths = {
+        key: os.path.join(output_directory, f'{group_column}={str(key).replace(os.sep, "_")}.{file_format}')
+        for key in groups
+    }
+
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_render_worker) as executor:
+        futures = [
+            executor.submit(_render_group, plot, key, df.take(positions), paths[key], file_format, dpi, plot_kwargs, cache)
+            for key, positions in groups.items()
+        ]
+        for future in futures:
+            future.result()
+
+    elapsed = time.perf_counter() - start
+    print(f'{len(paths)} charts rendered in {elapsed:.1f}s ({len(paths) / elapsed:.1f} charts/s)')
+
+    return paths
@@ -1,30 +1,108 @@
+import os
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Union
 
 import pandas_flavor as pf
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from datetime import datetime
+from functools import lru_cache
+
+def _parse_date(value, date_format):
+    if isinstance(value, str):
+        value = datetime.strptime(value, date_format)
+    return np.datetime64(pd.Timestamp(value).date(), 'D')
+
+@lru_cache(maxsize=256)
+def _date_range_calc(start_date, end_date, freq='D', interval=1, holidays=()):
+# Helper function to calculate date range, memoized on the (start, end, freq, interval, holidays) request
+    if freq == 'MS':
+        dl = np.arange(start_date.astype('datetime64[M]'), end_date.astype('datetime64[M]') + 1)
+        dl = dl.astype('datetime64[D]')
+        dl = dl[dl >= start_date]
+    else:
+        dl = np.arange(start_date, end_date + 1, dtype='datetime64[D]')
+
+    holidays = np.array(holidays, dtype='datetime64[D]')
+
+    if freq == 'B':
+        dl = dl[np.is_busday(dl, holidays=holidays)]
+    elif len(holidays):
+        dl = dl[~np.isin(dl, holidays)]
+
+    dl = dl[::interval]
+    # Cached arrays are shared between callers
+    dl.flags.writeable = False
+
+    return dl
+
+def _format_dates(dl, date_format):
+    if date_format == '%Y-%m-%d':
+        return np.datetime_as_string(dl, unit='D').tolist()
+    return pd.DatetimeIndex(dl).strftime(date_format).tolist()
+
+def date_sequence(
+    start_date: str, 
+    end_date: str, 
+    freq: str='D', 
+    interval: int=1, 
+    date_format: str='%Y-%m-%d', 
+    holidays: list=None
+) -> np.ndarray:
 
-def _date_range_calc(start_date, end_date, number_of_days, date_format='%Y-%m-%d'):
-# Helper function to calculate date range
-    start_date = datetime.striptime(start_date, date_format)
-    end_date = datetime.striptime(end_date, date_format)
-    
-    dl = pd.period_range(
-        start_date,
-        end_date,
-        periods=number_of_days
-        )
-    dl = sorted(dl)
+    """Creates a numpy datetime64[D] array of dates between a start and end date (inclusive).
+
+        Results are memoized, so repeated requests for the same range are served from cache.
+
+        Examples:
+            Functional usage
+
+            >>> from bizwiz import datatools as dt
+            >>> days = dt.date_sequence(
+            ...     start_date = '2024-01-01',
+            ...     end_date = '2024-12-31',
+            ...     freq = 'B',
+            ...     holidays = ['2024-07-04', '2024-12-25']
+            ... )  # doctest: +SKIP
 
-    return dl    
+
+        Args:
+            start_date: Beginning date of the sequence as a string in date_format or a date/datetime
+            end_date: Ending date of the sequence as a string in date_format or a date/datetime
+            freq: D for calendar days, B for business days or MS for month starts. Default is D.
+            interval: Keep every interval-th date of the sequence. Default is 1.
+            date_format: datetime compatible date format of string inputs. Default is %Y-%m-%d e.g. '2024-01-31'
+            holidays: Optional list of dates excluded from the sequence. Default is None.
+
+        Returns:
+            Read only numpy datetime64[D] array of dates.
+    """
+
+    if freq not in ('D', 'B', 'MS'):
+        raise ValueError(f"freq must be one of 'D', 'B' or 'MS', got {freq!r}")
+
+    holidays = tuple(sorted(_parse_date(x, date_format) for x in (holidays or [])))
+
+    return _date_range_calc(
+        _parse_date(start_date, date_format), 
+        _parse_date(end_date, date_format), 
+        freq, 
+        interval, 
+        holidays
+    )
 
 def create_date_list( 
     start_date: str, 
     end_date: str, 
     number_of_days: int=1, 
     date_format: str='%Y-%m-%d', 
-    remove_weekends: bool=False
+    remove_weekends: bool=False,
+    holidays: list=None,
+    as_datetime64: bool=False
 ) -> list:
     
     """Creates a list of dates between a specified start and end date based on a defined interval.
@@ -37,39 +115,40 @@ def create_date_list(
             >>> import pandas as pd
             >>> from bizwiz import datatools as dt
             >>> days = dt.create_date_list(
-            ...     start_date = '2023-01-01'
-            ...     end_date = '2023-12-01
-            ...     number_of_days = 1
-            ...     date_format = '%Y-%m-%d'
-            ...     remove_weekends: True
+            ...     start_date = '2023-01-01',
+            ...     end_date = '2023-12-01',
+            ...     number_of_days = 1,
+            ...     date_format = '%Y-%m-%d',
+            ...     remove_weekends = True
             ... )  # doctest: +SKIP
 
 
         Args:
             start_date: Beginning date of the sequence
             end_date: Ending date of the sequence
-            number_of_days: Number of days to increment by
+            number_of_days: Number of days to increment by (business days when remove_weekends is True)
             date_format: datetime compatible date format. Default is %Y-%m-%d e.g. '2024-01-31'
             remove_weekends: Dictates if calendar days or business days are displayed. Default is False (calendar days)
+            holidays: Optional list of dates to exclude. Default is None.
+            as_datetime64: Set to True to return a numpy datetime64 array instead of formatted strings. Default is False.
 
         Returns:
             List of days between the defined start and end dates.
     """
        
-    date_list = _date_range_calc(start_date, end_date, number_of_days, date_format)
-    
-    if remove_weekends == True:
-        date_list = [x.strftime(date_format) for x in date_list]
-        
-    # remove holidays coming soon - user input list or default to US public holidays
-    date_list = [x.strftime(date_format) for x in date_list]
+    freq = 'B' if remove_weekends == True else 'D'
+    date_list = date_sequence(start_date, end_date, freq, number_of_days, date_format, holidays)
+
+    if as_datetime64 == True:
+        return date_list.copy()
 
-    return date_list
+    return _format_dates(date_list, date_format)
     
 def create_month_list(
     start_date: str, 
     end_date: str, 
-    date_format: str='%Y-%m-%d'
+    date_format: str='%Y-%m-%d',
+    as_datetime64: bool=False
 ) -> list:
     
     """Creates a list of months between a specified start and end date.
@@ -81,9 +160,9 @@ def create_month_list(
 
             >>> import pandas as pd
             >>> from bizwiz import datatools as dt
-            >>> days = dt.create_monthlist(
-            ...     start_date = '2023-01-01'
-            ...     end_date = '2023-12-01
+            >>> days = dt.create_month_list(
+            ...     start_date = '2023-01-01',
+            ...     end_date = '2023-12-01',
             ...     date_format = '%Y-%m-%d'
             ... )  # doctest: +SKIP
 
@@ -91,41 +170,66 @@ def create_month_list(
             start_date: Beginning date of the sequence
             end_date: Ending date of the sequence
             date_format: datetime compatible date format. Default is %Y-%m-%d e.g. '2024-01-31'
+            as_datetime64: Set to True to return a numpy datetime64 array instead of formatted strings. Default is False.
 
         Returns:
             List of days between the defined start and end dates.
     """
     
-    date_list = _date_range_calc(start_date, end_date, date_format)
-    date_list = date_list[date_list.day==1]
-    date_list = sorted(date_list)
-    date_list = [x.strftime(date_format) for x in date_list]
-
-    return date_list
-
-def _business_days(start_date, end_date):
-    # if the start date is on a weekend, forward the date to next Monday
-    WEEKDAY_FRIDAY = 4 
-    
-    if start_date.weekday() > WEEKDAY_FRIDAY:
-        start_date = start_date + timedelta( days=7 - start_date.weekday() )
-
-    # if the end date is on a weekend, rewind the date to the previous Friday
-    if end_date.weekday() > WEEKDAY_FRIDAY:
-        end_date = end_date - timedelta( days=end_date.weekday() - WEEKDAY_FRIDAY )
-
-    if start_date > end_date:
-        return 0
-    # that makes the difference easy, no remainders etc
-    diff_days = (end_date - start_date).days + 1
-    weeks = int(diff_days / 7)
-
-    remainder = end_date.weekday() - start_date.weekday() + 1
-
-    if remainder != 0 and end_date.weekday() < start_date.weekday():
-        remainder = 5 + remainder
-        
-    return weeks * 5 + remainder
+    date_list = date_sequence(start_date, end_date, 'MS', 1, date_format)
+
+    if as_datetime64 == True:
+        return date_list.copy()
+
+    return _format_dates(date_list, date_format)
+
+def _to_datetime_column(s, date_format):
+    # Parse a whole column in one pass, falling back to inference if the format does not match
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s
+    try:
+        return pd.to_datetime(s, format=date_format)
+    except (ValueError, TypeError):
+        return pd.to_datetime(s)
+
+def _wall_time(s, unit):
+    # Tz-aware columns are truncated on local wall time, as the per-row datetime arithmetic did
+    if isinstance(s.dtype, pd.DatetimeTZDtype):
+        s = s.dt.tz_localize(None)
+    return s.to_numpy(dtype='datetime64[ns]').astype(f'datetime64[{unit}]')
+
+def _business_days(start_dates, end_dates, holidays=None):
+    # Inclusive count of weekdays between the dates, 0 when the end falls before the start.
+    # Weekend start/end dates are never counted, so busday_count covers the roll forward/back.
+    start_days = _wall_time(start_dates, 'D')
+    end_days = _wall_time(end_dates, 'D')
+    missing = np.isnat(start_days) | np.isnat(end_days)
+
+    if holidays is None:
+        holidays = []
+    holidays = pd.to_datetime(list(holidays)).to_numpy(dtype='datetime64[ns]').astype('datetime64[D]')
+
+    epoch = np.datetime64('1970-01-01', 'D')
+    start_days = np.where(missing, epoch, start_days)
+    end_days = np.where(missing, epoch, end_days)
+
+    counts = np.busday_count(start_days, end_days + np.timedelta64(1, 'D'), holidays=holidays)
+    counts = np.clip(counts, 0, None)
+
+    if missing.any():
+        return pd.Series(np.where(missing, np.nan, counts), index=start_dates.index)
+    return pd.Series(counts, index=start_dates.index)
+
+def _period_diff(start_dates, end_dates, unit):
+    # Whole calendar months ('M') or years ('Y') between the dates via datetime64 truncation
+    start_periods = _wall_time(start_dates, unit)
+    end_periods = _wall_time(end_dates, unit)
+    diff = end_periods - start_periods
+    missing = np.isnat(diff)
+
+    if missing.any():
+        return pd.Series(np.where(missing, np.nan, diff.astype('int64')), index=start_dates.index)
+    return pd.Series(diff.astype('int64'), index=start_dates.index)
 
 @pf.register_dataframe_method
 def date_diff(
@@ -133,7 +237,8 @@ def date_diff(
     start_date_column: str, 
     end_date_column: str, 
     date_format: str = '%Y-%m-%d', 
-    calculation: str='days'
+    calculation: str='days',
+    holidays: list=None
 ) -> pd.DataFrame:
         
     """Computes the difference between two dataframe date columns in calendar/business days, months, or years.
@@ -160,41 +265,185 @@ def date_diff(
             date_format: datetime compatible date format. Default is %Y-%m-%d e.g. '2024-01-31'
             calculation: Differencing calculation. Default is day, which adds both calendar and business days to dataframe.
                 Options are days, months, years
+            holidays: Optional list of dates excluded from the business day count. Default is None (weekends only)
 
         Returns:
             DataFrame that has date differenced columns.
     """
-    start_list = [pd.to_datetime(x) for x in df[start_date_column].tolist()]
-    end_list = [pd.to_datetime(x) for x in df[end_date_column].tolist()]
+    start_dates = _to_datetime_column(df[start_date_column], date_format)
+    end_dates = _to_datetime_column(df[end_date_column], date_format)
 
     calculation = calculation.lower()
 
     if calculation in['day', 'd', 'days']:
-        calendar_diff_list = [(x - y).days for x, y in zip(end_list, start_list)]
-        business_day_diff_list = [_business_days(x, y) for x,y in zip(start_list, end_list)]
-
-        df['date_diff_calendar_days'] = calendar_diff_list
-        df['date_diff_business_days'] = business_day_diff_list
+        df['date_diff_calendar_days'] = (end_dates - start_dates).dt.days
+        df['date_diff_business_days'] = _business_days(start_dates, end_dates, holidays)
         
     elif calculation in['month', 'months']:
-        month_diff_list = [(x.year - y.year) * 12 + x.month - y.month for x, y in zip(end_list, start_list)]
-
-        df['date_diff_months']  = month_diff_list
+        df['date_diff_months'] = _period_diff(start_dates, end_dates, 'M')
         
     elif calculation in['year', 'years']:
-        year_diff_list = [(x.year - y.year) for x, y in zip(end_list, start_list)]
-
-        df['date_diff_years']  = year_diff_list
+        df['date_diff_years'] = _period_diff(start_dates, end_dates, 'Y')
              
     return df
 
 
+class LookupIndex(Mapping):
+    """Compact key to value lookup backed by a sorted key array and an aligned value array.
+
+        Lookups binary search the sorted keys, so memory is two arrays rather than a hash table of
+        python objects. String keys and values are held as fixed width numpy unicode arrays, so they
+        are stored and memory mapped like numeric ones. Duplicate keys keep the last value, matching
+        dict_from_df. Null keys are dropped.
+
+        Examples:
+            Functional usage
+
+            >>> from bizwiz import datatools as dt
+            >>> lookup = df.dict_from_df('product_id', 'category', compact=True)  # doctest: +SKIP
+            >>> sales['category'] = lookup.map(sales['product_id'])  # doctest: +SKIP
+            >>> lookup.save('product_category.arrow')  # doctest: +SKIP
+            >>> lookup = dt.LookupIndex.load('product_category.arrow')  # doctest: +SKIP
+
+        Args:
+            keys: Array of unique keys sorted ascending
+            values: Array of values aligned with keys
+    """
+
+    def __init__(self, keys, values):
+        self._keys = _fixed_width(keys)
+        self._values = _fixed_width(values)
+
+    @classmethod
+    def from_df(cls, df, key_column, value_column):
+        df = df[df[key_column].notna()]
+        keys = pa.array(df[key_column].to_numpy())
+        order = pc.sort_indices(keys).to_numpy()
+
+        keys = _fixed_width(df[key_column].to_numpy()[order])
+        values = df[value_column].to_numpy()[order]
+
+        # Keep the last occurrence of each key; the stable sort preserves the original row order within a key
+        last = np.append(keys[1:] != keys[:-1], True) if len(keys) else np.zeros(0, dtype=bool)
+
+        return cls(keys[last], values[last])
+
+    def _positions(self, lookup):
+        found_type = np.ones(len(lookup), dtype=bool)
+        if self._keys.dtype.kind == 'U':
+            # Only str needles can match fixed width string keys; anything else is simply not found
+            if pd.api.types.infer_dtype(lookup, skipna=False) != 'string':
+                found_type = np.array([isinstance(x, str) for x in lookup], dtype=bool)
+                lookup = np.where(found_type, lookup, '')
+            lookup = np.asarray(lookup, dtype=str)
+
+        # Searching in sorted order keeps the binary searches cache friendly on large inputs
+        if len(lookup) > 1024:
+            order = np.argsort(lookup, kind='stable')
+            pos = np.empty(len(lookup), dtype=np.intp)
+            pos[order] = np.searchsorted(self._keys, lookup[order])
+        else:
+            pos = np.searchsorted(self._keys, lookup)
+        pos = np.minimum(pos, max(len(self._keys) - 1, 0))
+        found = self._keys[pos] == lookup if len(self._keys) else np.zeros(len(lookup), dtype=bool)
+        return pos, np.asarray(found, dtype=bool) & found_type
+
+    def map(self, s, default=np.nan):
+        """Vectorized lookup of every value in a Series, returning default where the key is missing."""
+        lookup = s.to_numpy()
+        present = np.asarray(pd.notna(lookup), dtype=bool)
+        pos, found = self._positions(lookup[present] if not present.all() else lookup)
+
+        matched = np.flatnonzero(present)[found]
+        if len(matched) == len(lookup):
+            # Every key was found, so the values are gathered directly without a default filled array
+            result = self._values[pos]
+        else:
+            dtype = self._values.dtype
+            dtype = object if dtype.kind in 'OU' else np.result_type(dtype, np.asarray(default).dtype)
+            result = np.full(len(lookup), default, dtype=dtype)
+            result[matched] = self._values[pos[found]]
+
+        return pd.Series(result, index=s.index, name=s.name)
+
+    def __getitem__(self, key):
+        if self._keys.dtype.kind == 'U' and not isinstance(key, str):
+            raise KeyError(key)
+        needle = np.empty(1, dtype=object) if self._keys.dtype == object else np.asarray([key])
+        needle[0] = key
+        try:
+            pos, found = self._positions(needle)
+        except (TypeError, ValueError):
+            raise KeyError(key)
+        if not found[0]:
+            raise KeyError(key)
+        return self._values[pos[0]].item() if self._values.dtype.kind == 'U' else self._values[pos[0]]
+
+    def __contains__(self, key):
+        try:
+            self[key]
+            return True
+        except KeyError:
+            return False
+
+    def __iter__(self):
+        return iter(self._keys.tolist() if self._keys.dtype.kind == 'U' else self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __repr__(self):
+        return f'LookupIndex({len(self)} keys)'
+
+    def save(self, path):
+        """Write the keys and values to an uncompressed Arrow IPC file that load can memory map."""
+        columns, metadata = {}, {}
+        for name, array in (('key', self._keys), ('value', self._values)):
+            if array.dtype.kind == 'U':
+                # Stored as the raw fixed width buffer so load can view it in place
+                metadata[name] = array.dtype.str
+                array = np.ascontiguousarray(array)
+                array = pa.Array.from_buffers(pa.binary(array.dtype.itemsize), len(array), [None, pa.py_buffer(array)])
+            columns[name] = array
+        table = pa.table(columns).replace_schema_metadata(metadata)
+        with pa.OSFile(path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        """Memory map a saved lookup. Numeric and string key and value columns are used in place without copying."""
+        table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+        metadata = {k.decode(): v.decode() for k, v in (table.schema.metadata or {}).items()}
+
+        arrays = []
+        for name in ('key', 'value'):
+            column = table.column(name)
+            if name in metadata:
+                chunk = column.combine_chunks()
+                dtype = np.dtype(metadata[name])
+                arrays.append(np.frombuffer(chunk.buffers()[1], dtype=dtype, count=len(chunk), offset=chunk.offset * dtype.itemsize))
+            else:
+                arrays.append(column.to_numpy())
+
+        return cls(*arrays)
+
+def _fixed_width(array):
+    # Object arrays holding only str become fixed width unicode arrays: no per key python objects,
+    # native comparisons for sorting and searching, and a flat buffer that can be memory mapped
+    array = np.asarray(array)
+    if array.dtype == object and len(array) and pd.api.types.infer_dtype(array, skipna=False) == 'string':
+        return array.astype(str)
+    return array
+
 @pf.register_dataframe_method
 def dict_from_df(
     df: pd.DataFrame, 
     key_column: str, 
-    value_column: str
-) -> dict:
+    value_column: str,
+    compact: bool=False
+) -> Union[dict, LookupIndex]:
 
     """Create a dictionary from dataframe columns
 
@@ -213,10 +462,14 @@ def dict_from_df(
                 df: Primary dataframe
                 key_column: Column name containing the values to be used dictionary keys
                 value_column: Column name containing the values to be used as dictionary values
+                compact: Set to True to return a LookupIndex backed by sorted arrays instead of a dict. Default is False.
                 
             Returns:
-                Dictionary with key, value combinations based on dataframe columns
+                Dictionary (or LookupIndex) with key, value combinations based on dataframe columns
             """
+
+    if compact == True:
+        return LookupIndex.from_df(df, key_column, value_column)
         
     t_dict = df.set_index(key_column).to_dict()[value_column]
 
@@ -247,39 +500,266 @@ def fill_leading_zero(
     
     return df
 
+class GroupView(Mapping):
+    """Read only mapping of group key to DataFrame, storing only each group's row positions.
+
+        A group's rows are sliced out of the source dataframe when it is accessed, so only the
+        groups actually used are ever copied.
+    """
+
+    def __init__(self, df, column_name):
+        self._df = df
+        self._indices = df.groupby(column_name).indices
+        # Match the keys of iterating the groupby, which are tuples when grouping by a one element list
+        if isinstance(column_name, list) and len(column_name) == 1:
+            self._indices = {(key,): positions for key, positions in self._indices.items()}
+
+    def __getitem__(self, key):
+        return self._df.take(self._indices[key])
+
+    def __iter__(self):
+        return iter(self._indices)
+
+    def __len__(self):
+        return len(self._indices)
+
+    def __repr__(self):
+        return f'GroupView({len(self)} groups)'
+
 @pf.register_dataframe_method
 def subset_by_group(
     df: pd.DataFrame, 
-    column_name: str
-) -> dict:
+    column_name: str,
+    lazy: bool=True
+) -> Mapping:
+
+    """Split a dataframe into a mapping of group value to the rows in that group.
+
+        Examples:
+            Functional usage
+
+            >>> import pandas as pd
+            >>> from bizwiz import datatools as dt
+            >>> groups = df.subset_by_group('region')  # doctest: +SKIP
+            >>> groups['West']  # doctest: +SKIP
+
+
+        Args:
+            df: DataFrame to split
+            column_name: Column name or list of column names to group by
+            lazy: Set to True to return a GroupView that slices groups on access. False builds a dict of copies. Default is True.
+            
+
+        Returns:
+            GroupView or dictionary of group value to DataFrame
+    """
+
+    if lazy == True:
+        return GroupView(df, column_name)
 
     return dict(iter(df.groupby(column_name)))
 
+def _write_partition(group, path, file_format, kwargs):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if file_format == 'parquet':
+        group.to_parquet(path, index=False, **kwargs)
+    else:
+        group.to_csv(path, index=False, **kwargs)
+    return path
+
+@pf.register_dataframe_method
+def write_group_partitions(
+    df: pd.DataFrame, 
+    column_name: str,
+    output_directory: str,
+    file_format: str='parquet',
+    max_workers: int=None,
+    **kwargs
+) -> dict:
+
+    """Write each group of a dataframe to its own hive style partition in parallel.
+
+        Files are written to output_directory/column_name=value/part-00000.parquet (or .csv). As with other
+        hive partitioned datasets the partition column lives in the directory name rather than the files.
+
+        Examples:
+            Functional usage
+
+            >>> import pandas as pd
+            >>> from bizwiz import datatools as dt
+            >>> paths = df.write_group_partitions('region', 'exports/by_region', max_workers=8)  # doctest: +SKIP
+
+
+        Args:
+            df: DataFrame to split
+            column_name: Column name to partition by
+            output_directory: Root directory for the partitions
+            file_format: Either parquet or csv. Default is parquet.
+            max_workers: Number of writer threads. Default is None (executor default).
+            **kwargs: Passed through to DataFrame.to_parquet or DataFrame.to_csv
+            
+
+        Returns:
+            Dictionary of group value to the file path written
+    """
+
+    groups = GroupView(df, column_name)
+    paths = {
+        key: os.path.join(output_directory, f'{column_name}={str(key).replace(os.sep, "_")}', f'part-00000.{file_format}')
+        for key in groups
+    }
+
+    def write(key):
+        return _write_partition(groups[key].drop(columns=column_name), paths[key], file_format, kwargs)
+
+    # Groups are sliced inside the workers so only the partitions in flight are held in memory
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(write, groups))
+
+    return paths
+
+def _row_hashes(df, columns, chunksize):
+    # Hash rows chunk by chunk so the temporary hashing buffers stay bounded
+    hashes = np.empty(len(df), dtype='uint64')
+    for i in range(0, len(df), chunksize):
+        hashes[i:i + chunksize] = pd.util.hash_pandas_object(df[columns].iloc[i:i + chunksize], index=False).to_numpy()
+    return hashes
+
+@pf.register_dataframe_method
+def dataframe_diff(
+    df: pd.DataFrame, 
+    df2: pd.DataFrame,
+    key_columns: Union[str, list],
+    compare_columns: list=None,
+    chunksize: int=1000000
+) -> Dict[str, pd.DataFrame]:
+
+    """Key based comparison of two dataframes reporting added, removed and changed rows and cells.
+
+            Rows are aligned on the key columns and each row's remaining values are hashed, so only rows whose
+            hash differs are compared cell by cell, chunksize rows at a time.
+
+            Examples:
+                Functional usage
+
+                >>> import pandas as pd
+                >>> from bizwiz import datatools as dt
+                >>> diff = df.dataframe_diff(df2,
+                ... key_columns = ['account_id', 'month']
+                ... )  # doctest: +SKIP
+                >>> diff['changed_cells']  # doctest: +SKIP
+
+
+            Args:
+                df: Primary (old) dataframe
+                df2: dataframe to be compared to the primary (new)
+                key_columns: Column name or list of column names uniquely identifying a row in both dataframes
+                compare_columns: Columns to compare. Default is None (all non key columns present in both).
+                chunksize: Number of rows hashed and compared at a time. Default is 1,000,000.
+                
+
+            Returns:
+                Dictionary of DataFrames: added (rows only in df2), removed (rows only in df),
+                changed (df2 rows with at least one changed value) and changed_cells (key columns, col, from, to)
+    """
+
+    if isinstance(key_columns, str):
+        key_columns = [key_columns]
+
+    if compare_columns is None:
+        compare_columns = [c for c in df.columns if c not in key_columns and c in df2.columns]
+
+    for name, frame in (('df', df), ('df2', df2)):
+        if frame.duplicated(key_columns).any():
+            raise ValueError(f'key_columns {key_columns} do not uniquely identify rows in {name}')
+
+    left = df[key_columns].reset_index(drop=True)
+    left['_hash'] = _row_hashes(df, compare_columns, chunksize)
+    left['_pos'] = np.arange(len(df))
+
+    right = df2[key_columns].reset_index(drop=True)
+    right['_hash'] = _row_hashes(df2, compare_columns, chunksize)
+    right['_pos'] = np.arange(len(df2))
+
+    # Only keys, hashes and positions are joined, never the full rows
+    aligned = left.merge(right, on=key_columns, how='outer', suffixes=('_left', '_right'), indicator=True)
+
+    removed = df.iloc[aligned.loc[aligned['_merge'] == 'left_only', '_pos_left'].astype('int64')]
+    added = df2.iloc[aligned.loc[aligned['_merge'] == 'right_only', '_pos_right'].astype('int64')]
+
+    candidates = aligned[(aligned['_merge'] == 'both') & (aligned['_hash_left'] != aligned['_hash_right'])]
+    left_pos = candidates['_pos_left'].to_numpy(dtype='int64')
+    right_pos = candidates['_pos_right'].to_numpy(dtype='int64')
+
+    cells = []
+    changed_pos = []
+
+    for i in range(0, len(candidates), chunksize):
+        old = df.iloc[left_pos[i:i + chunksize]].reset_index(drop=True)
+        new = df2.iloc[right_pos[i:i + chunksize]].reset_index(drop=True)
+        row_changed = np.zeros(len(old), dtype=bool)
+
+        for col in compare_columns:
+            # Nullable and Arrow dtypes compare to <NA> when one side is missing, which counts as a change
+            unequal = (old[col] != new[col]).to_numpy(dtype=bool, na_value=True)
+            mask = unequal & ~(old[col].isna() & new[col].isna()).to_numpy(dtype=bool)
+            if mask.any():
+                row_changed |= mask
+                cell = old.loc[mask, key_columns].reset_index(drop=True)
+                cell['col'] = col
+                cell['from'] = old.loc[mask, col].to_numpy(dtype=object)
+                cell['to'] = new.loc[mask, col].to_numpy(dtype=object)
+                cells.append(cell)
+
+        changed_pos.append(right_pos[i:i + chunksize][row_changed])
+
+    changed = df2.iloc[np.concatenate(changed_pos) if changed_pos else np.array([], dtype='int64')]
+
+    if cells:
+        changed_cells = pd.concat(cells, ignore_index=True)
+    else:
+        changed_cells = pd.DataFrame(columns=key_columns + ['col', 'from', 'to'])
+
+    return {'added': added, 'removed': removed, 'changed': changed, 'changed_cells': changed_cells}
+
 @pf.register_dataframe_method
 def dataframe_compare(
     df: pd.DataFrame, 
     df2: pd.DataFrame,
+    key_columns: Union[str, list]=None,
+    chunksize: int=1000000
 ) -> pd.DataFrame:
         
     """Compare two dataframes and output a dataframe of values that changed.
 
+            Without key_columns the dataframes must be identically labeled and are compared position by position.
+            With key_columns rows are aligned on the keys using dataframe_diff.
+
             Examples:
                 Functional usage
 
                 >>> import pandas as pd
                 >>> from bizwiz import datatools as dt
-                >>> df = df.dataframe_compare(df2
+                >>> df = df.dataframe_compare(df2,
+                ... key_columns = 'account_id'
                 ... )  # doctest: +SKIP
 
 
             Args:
                 df: Primary dataframe
                 df2: dataframe to be compared to the primary
+                key_columns: Column name or list of column names to align rows on. Default is None (align on labels).
+                chunksize: Number of rows hashed and compared at a time when key_columns is given. Default is 1,000,000.
                 
 
             Returns:
                 DataFrame that has breakdown of the values that changed
     """
+
+    if key_columns is not None:
+        cells = dataframe_diff(df, df2, key_columns, chunksize=chunksize)['changed_cells']
+        index = [key_columns] if isinstance(key_columns, str) else list(key_columns)
+        return cells.set_index(index + ['col'])
     
     ne_stacked = (df != df2).stack()
     changed = ne_stacked[ne_stacked]
@@ -290,43 +770,102 @@ def dataframe_compare(
     result = pd.DataFrame({'from': changed_from, 'to': changed_to}, index=changed.index)
     return result
 
+def _key_schema(sources, column_names):
+    # One Arrow type per key column across both inputs, so 1 (int64) and 1.0 (float64) hash alike
+    schemas = [
+        pa.schema([ds.dataset(source).schema.field(c) for c in column_names]) if isinstance(source, str)
+        else pa.Schema.from_pandas(source[column_names], preserve_index=False)
+        for source in sources
+    ]
+    schemas = [schema.remove_metadata() for schema in schemas]
+    try:
+        return pa.unify_schemas(schemas, promote_options='permissive')
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        # Types with no common promotion (e.g. int against string) are compared as strings
+        return pa.schema([
+            pa.field(c, schemas[0].field(c).type if all(s.field(c).type == schemas[0].field(c).type for s in schemas) else pa.string())
+            for c in column_names
+        ])
+
+def _cast_keys(df, column_names, key_schema):
+    keys = pa.Table.from_pandas(df[column_names], preserve_index=False).replace_schema_metadata(None)
+    return keys.cast(key_schema).to_pandas()
+
+def _key_hashes(df, column_names, key_schema):
+    return pd.util.hash_pandas_object(_cast_keys(df, column_names, key_schema), index=False).to_numpy()
+
+def _source_key_hashes(source, column_names, key_schema):
+    # Parquet sources only read the key columns
+    if isinstance(source, str):
+        source = ds.dataset(source).to_table(columns=column_names).to_pandas()
+    return _key_hashes(source, column_names, key_schema)
+
+def _rows_missing_keys(source, column_names, other_hashes, key_schema, batch_size):
+    # Gather rows whose key hash is absent from the other side, streaming parquet sources batch by batch
+    if isinstance(source, str):
+        parts = []
+        for batch in ds.dataset(source).to_batches(batch_size=batch_size):
+            chunk = batch.to_pandas()
+            parts.append(chunk[~np.isin(_key_hashes(chunk, column_names, key_schema), other_hashes)])
+        return pd.concat(parts, ignore_index=True) if parts else ds.dataset(source).schema.empty_table().to_pandas()
+
+    return source[~np.isin(_key_hashes(source, column_names, key_schema), other_hashes)]
+
 @pf.register_dataframe_method
 def unique_records_between_df(
-    df: pd.DataFrame, 
-    df2: pd.DataFrame, 
-    column_names: list
+    df: Union[pd.DataFrame, str], 
+    df2: Union[pd.DataFrame, str], 
+    column_names: list,
+    batch_size: int=1000000
 ) -> pd.DataFrame:
-    """Get the unique records between two like dataframe columns
+    """Get the records whose key columns appear in only one of two like dataframes
+
+            Key columns are hashed on each side and only the rows missing from the other side are gathered,
+            so the full union of both inputs is never built. Either input can be a parquet file or dataset path,
+            in which case only its key columns are read up front and its rows are filtered batch by batch.
 
             Examples:
                 Functional usage
 
                 >>> import pandas as pd
                 >>> from bizwiz import datatools as dt
-                >>> df = df['lookup_column'].create_flag(
-                ...     flag_name = 'mapped_values',
-                ...     lookup_list = ['A', 'B', 'C']
-                ...     map_if_in_list = True
+                >>> df = dt.unique_records_between_df(
+                ...     'extracts/accounts_jan.parquet',
+                ...     'extracts/accounts_feb.parquet',
+                ...     column_names = ['account_id']
                 ... )  # doctest: +SKIP
 
 
             Args:
-                df: DataFrame containing the data to map
-                df2: 
-                column_names:
+                df: DataFrame or parquet path of the first set of records
+                df2: DataFrame or parquet path of the second set of records
+                column_names: Column name or list of column names used to match records
+                batch_size: Rows per batch when filtering parquet inputs. Default is 1,000,000.
                 
 
             Returns:
-                DataFrame that has date differenced columns.
+                DataFrame of unmatched records from both inputs in pd.merge outer layout, with _merge set to left_only or right_only
     """
     
-    if isinstance(column_names) == str:
-        column_names = list(column_names)
+    if isinstance(column_names, str):
+        column_names = [column_names]
 
-    result = pd.merge(df, df2, on=column_names, how = 'outer', indicator=True)
-    result = result[result._merge != 'both'] # Filter out records from both
+    key_schema = _key_schema([df, df2], column_names)
+    left_hashes = _source_key_hashes(df, column_names, key_schema)
+    right_hashes = _source_key_hashes(df2, column_names, key_schema)
 
-    return result
+    left_only = _rows_missing_keys(df, column_names, right_hashes, key_schema, batch_size)
+    right_only = _rows_missing_keys(df2, column_names, left_hashes, key_schema, batch_size)
+
+    # Both sides carry the hashed key types so the merge can line them up (e.g. int against string keys)
+    left_only = left_only.assign(**_cast_keys(left_only, column_names, key_schema).set_index(left_only.index))
+    right_only = right_only.assign(**_cast_keys(right_only, column_names, key_schema).set_index(right_only.index))
+
+    # The key sets are disjoint, so this merge only lays the unmatched rows out side by side
+    result = pd.merge(left_only, right_only, on=column_names, how = 'outer', indicator=True)
+
+    # Safety net for keys that hash apart but still compare equal in the merge
+    return result[result._merge != 'both']
 
 @pf.register_dataframe_method
 def create_flag(
@@ -379,3 +918,101 @@ def create_flag(
         df.loc[~(df[lookup_column].isin(lookup_list)), flag_name] = flag_value
     
     return df
+
+def _factorize_column(s):
+    # Categorical columns reuse their codes, other columns are factorized once so each lookup only hashes the uniques
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        return s.cat.codes.to_numpy(), pd.Index(s.cat.categories)
+    codes, uniques = pd.factorize(s)
+    return codes, pd.Index(uniques)
+
+def _isin_codes(codes, uniques, lookup_list):
+    lookup_list = list(lookup_list)
+    match_missing = any(pd.isna(x) for x in lookup_list if np.ndim(x) == 0)
+    unique_mask = uniques.isin(lookup_list)
+    return np.where(codes >= 0, unique_mask[np.maximum(codes, 0)] if len(uniques) else False, match_missing)
+
+@pf.register_dataframe_method
+def create_flags(
+        df: pd.DataFrame, 
+        flag_specs: list
+) -> pd.DataFrame:
+
+    """Creates many flag columns in one pass. Equivalent to chaining create_flag once per spec.
+
+        Each lookup column is factorized once (categorical columns reuse their codes) and each distinct lookup
+        set is only matched against the column's unique values, then all flag columns are assigned together.
+
+        Examples:
+            Functional usage
+
+            >>> import pandas as pd
+            >>> from bizwiz import datatools as dt
+            >>> df = df.create_flags([
+            ...     {'lookup_column': 'state', 'flag_name': 'west_coast', 'lookup_list': ['CA', 'OR', 'WA']},
+            ...     {'lookup_column': 'product', 'flag_name': 'non_core', 'lookup_list': core_products, 'map_if_in_list': False},
+            ... ])  # doctest: +SKIP
+
+
+        Args:
+            df: DataFrame containing the data to map
+            flag_specs: List of dictionaries holding create_flag arguments: lookup_column, flag_name and lookup_list,
+                plus optional overwrite_values, default_value, flag_value and map_if_in_list with the same defaults.
+            
+
+        Returns:
+            DataFrame with the generated flag columns.
+        """
+
+    defaults = {'overwrite_values': True, 'default_value': 'N', 'flag_value': 'Y', 'map_if_in_list': True}
+    factorized = {}
+    masks = {}
+    flags = {}
+
+    for spec in flag_specs:
+        spec = {**defaults, **spec}
+        lookup_column = spec['lookup_column']
+        flag_name = spec['flag_name']
+
+        # A spec may look up a flag created by an earlier spec, exactly as chained calls would see it
+        if lookup_column == flag_name and spec['overwrite_values'] == True:
+            # Chained calls overwrite the column before looking it up, so every row holds the default value
+            codes, uniques = _factorize_column(pd.Series([spec['default_value']]))
+            mask = np.full(len(df), _isin_codes(codes, uniques, spec['lookup_list'])[0])
+        elif lookup_column in flags:
+            codes, uniques = _factorize_column(flags[lookup_column])
+            mask = _isin_codes(codes, uniques, spec['lookup_list'])
+        else:
+            if lookup_column not in factorized:
+                factorized[lookup_column] = _factorize_column(df[lookup_column])
+            key = (lookup_column, tuple(pd.unique(pd.Series(list(spec['lookup_list']), dtype=object))))
+            if key not in masks:
+                masks[key] = _isin_codes(*factorized[lookup_column], spec['lookup_list'])
+            mask = masks[key]
+
+        if spec['map_if_in_list'] == False:
+            mask = ~mask
+
+        if spec['overwrite_values'] == True:
+            # Gathering from a two value series avoids a masked write over the whole column. The series is built
+            # like the chained column (default assigned, then the flag written through .loc) so both end with
+            # the same dtype
+            choices = pd.DataFrame(index=[0, 1])
+            choices['value'] = spec['default_value']
+            choices.loc[[1], 'value'] = spec['flag_value']
+            choices = choices['value']
+            flags[flag_name] = choices.take(mask.astype('int8')).set_axis(df.index)
+        elif flag_name in flags:
+            flags[flag_name] = flags[flag_name].mask(mask, spec['flag_value'])
+        elif flag_name in df.columns:
+            flags[flag_name] = df[flag_name].mask(mask, spec['flag_value'])
+        else:
+            # Partial assignment to a missing column, built the same way .loc enlargement does
+            new_column = pd.DataFrame(index=df.index)
+            new_column.loc[mask, flag_name] = spec['flag_value']
+            flags[flag_name] = new_column[flag_name]
+
+    for flag_name, values in flags.items():
+        df[flag_name] = values
+
+    return df
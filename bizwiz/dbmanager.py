@@ -1,11 +1,187 @@
 import pyodbc
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import datetime
+import decimal
+import hashlib
+import os
 import re
 import sqlparse
-import printable
+import threading
+import time
+from string import printable
+from collections import OrderedDict
+from contextlib import contextmanager
+from janitor import clean_names
+
+
+def _pyodbc_connect(dsn_name):
+    return pyodbc.connect(DSN=dsn_name, autocommit=True)
+
+
+class ConnectionPool:
+    """Thread safe pool of database connections keyed by DSN.
+
+        Idle connections are reused after a liveness check, connections idle for longer than
+        idle_timeout are closed, and at most max_size connections are open per DSN.
+
+        Examples:
+            Functional usage
+
+            >>> from bizwiz import dbmanager as db
+            >>> pool = db.ConnectionPool(max_size=4, idle_timeout=300)
+            >>> with pool.connection('redshift') as conn:
+            ...     df = db.querydb('select 1', conn)  # doctest: +SKIP
+
+        Args:
+            connect: Callable taking a DSN name and returning a DB-API connection. Default opens a pyodbc connection.
+            max_size: Maximum number of open connections per DSN. Default is 5.
+            idle_timeout: Seconds an idle connection is kept before being closed. Default is 300.
+            checkout_timeout: Seconds to wait for a free connection when the pool is full. Default is 30.
+            ping_query: Statement used to check a connection is alive before reuse. Default is select 1.
+    """
+
+    def __init__(self, connect=None, max_size=5, idle_timeout=300, checkout_timeout=30, ping_query='select 1'):
+        self.connect = _pyodbc_connect if connect is None else connect
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.ping_query = ping_query
+        self._idle = {}
+        self._open = {}
+        self._lock = threading.Condition()
+
+    def _is_alive(self, conn):
+        try:
+            cursor = conn.cursor()
+            cursor.execute(self.ping_query)
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _discard(self, dsn_name, conn):
+        # Network calls happen outside the lock; only the open count is updated under it
+        self._close(conn)
+        with self._lock:
+            self._open[dsn_name] -= 1
+            self._lock.notify()
+
+    def _pop_expired(self, dsn_name):
+        # Called with the lock held; the expired connections are closed by the caller after releasing it
+        now = time.monotonic()
+        expired, keep = [], []
+        for conn, released in self._idle.get(dsn_name, []):
+            if now - released > self.idle_timeout:
+                expired.append(conn)
+            else:
+                keep.append((conn, released))
+        self._idle[dsn_name] = keep
+        self._open[dsn_name] = self._open.get(dsn_name, 0) - len(expired)
+        return expired
+
+    def acquire(self, dsn_name='redshift'):
+        deadline = time.monotonic() + self.checkout_timeout
+
+        while True:
+            candidate, expired = None, []
+            with self._lock:
+                while True:
+                    expired += self._pop_expired(dsn_name)
+                    idle = self._idle[dsn_name]
+
+                    # Take the most recently released connection, it is pinged once the lock is released
+                    if idle:
+                        candidate, _ = idle.pop()
+                        break
+
+                    if self._open[dsn_name] < self.max_size:
+                        self._open[dsn_name] += 1
+                        break
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f'No free connection for {dsn_name} after {self.checkout_timeout}s')
+                    self._lock.wait(remaining)
+
+            for conn in expired:
+                self._close(conn)
+
+            if candidate is None:
+                break
+            if self._is_alive(candidate):
+                return candidate
+            self._discard(dsn_name, candidate)
+
+        try:
+            return self.connect(dsn_name)
+        except Exception:
+            with self._lock:
+                self._open[dsn_name] -= 1
+                self._lock.notify()
+            raise
+
+    def release(self, dsn_name, conn):
+        with self._lock:
+            self._idle.setdefault(dsn_name, []).append((conn, time.monotonic()))
+            self._lock.notify()
+
+    @contextmanager
+    def connection(self, dsn_name='redshift'):
+        conn = self.acquire(dsn_name)
+        try:
+            yield conn
+        finally:
+            self.release(dsn_name, conn)
+
+    def close_all(self):
+        with self._lock:
+            idle_connections = self._idle
+            self._idle = {}
+            for dsn_name, idle in idle_connections.items():
+                self._open[dsn_name] -= len(idle)
+            self._lock.notify_all()
+
+        for idle in idle_connections.values():
+            for conn, _ in idle:
+                self._close(conn)
+
+
+connection_pool = ConnectionPool()
+
+
+@contextmanager
+def _checkout(db_conn):
+    # DSN names are checked out of the shared pool, connection objects are used as given
+    if isinstance(db_conn, str):
+        with connection_pool.connection(db_conn) as conn:
+            yield conn
+    else:
+        yield db_conn
+
 
 def odbconnect(dsn_name='redshift'):
-    db_conn = pyodbc.connect(DSN=dsn_name, autocommit=True)
+    """Open a new connection to an ODBC data source.
+
+        querydb, execute_query_file and create_table_from_df also accept the DSN name in place of a
+        connection, in which case a pooled connection is checked out from connection_pool for the call.
+
+        Args:
+            dsn_name: ODBC data source name. Default is redshift.
+
+        Returns:
+            pyodbc connection with autocommit enabled
+    """
+    db_conn = _pyodbc_connect(dsn_name)
     return db_conn
 
 def execute_query_file(query, db_conn):
@@ -15,93 +191,416 @@ def execute_query_file(query, db_conn):
         sql_commands = open(query, 'r').read().strip().split(';')
         sql_commands = [x.strip() for x in sql_commands]
         sql_commands = [re.sub("[^{}]+".format(printable), "", x) for x in sql_commands]
-        sql_commands = [sqlparse.format(x, strip_comments=True).strip for x in sql_commands]
+        sql_commands = [sqlparse.format(x, strip_comments=True).strip() for x in sql_commands]
+        sql_commands = [x for x in sql_commands if x]
                       
     else:
-        pass
+        sql_commands = [query]
     
-    pd.io.sql.execute(query, db_conn)
+    with _checkout(db_conn) as conn:
+        for x in sql_commands:
+            _execute(conn, x)
     
     return print('Query Successfully Run')
 
 
-def querydb(query, db_conn):
-    
+def _read_query(query):
+    # Load and normalize a .sql file, plain query strings are returned unchanged
     if query.endswith('.sql')==True:
         query=open(query, 'r').read().strip()
         query = sqlparse.format(query, strip_comments=True).strip()
         query = re.sub("[^{}]+".format(printable), "", query)
-    else:
-        pass
     
-    result = pd.read_sql(query, db_conn)
+    return query
+
+
+_ARROW_TYPES = {
+    str: pa.string(),
+    int: pa.int64(),
+    float: pa.float64(),
+    bool: pa.bool_(),
+    bytes: pa.binary(),
+    bytearray: pa.binary(),
+    datetime.datetime: pa.timestamp('us'),
+    datetime.date: pa.date32(),
+}
+
+
+def _decimal_type(description):
+    # NUMERIC/DECIMAL keep exact precision; the cursor description carries (precision, scale) at [4:6]
+    precision, scale = description[4], description[5]
+    if not precision:
+        # Without a declared type no sample fixes the scale for later chunks, so use the widest exact decimal:
+        # up to 38 integer and 38 fractional digits, which covers the NUMERIC range of the common warehouses
+        return pa.decimal256(76, 38)
+    scale = scale or 0
+    return pa.decimal128(precision, scale) if precision <= 38 else pa.decimal256(precision, scale)
+
+def _arrow_schema(description, rows):
+    # Prefer the driver's column types (pyodbc reports python types), otherwise infer from the first chunk
+    names = [d[0] for d in description]
+    inferred = pa.Table.from_pylist([dict(zip(names, r)) for r in rows[:1000]]).schema if rows else None
+    fields = []
+    for i, d in enumerate(description):
+        arrow_type = _ARROW_TYPES.get(d[1])
+        if d[1] is decimal.Decimal:
+            arrow_type = _decimal_type(d)
+        if arrow_type is None and inferred is not None:
+            arrow_type = inferred.field(d[0]).type
+        if arrow_type is None or pa.types.is_null(arrow_type):
+            arrow_type = pa.string()
+        fields.append(pa.field(d[0], arrow_type))
+    return pa.schema(fields)
+
+
+def _fetch_chunks(query, db_conn, chunksize):
+    # Yields (description, rows) so only one chunk of rows is held in memory at a time
+    with _checkout(db_conn) as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(query)
+            while True:
+                rows = cursor.fetchmany(chunksize)
+                if not rows:
+                    break
+                yield cursor.description, [tuple(r) for r in rows]
+        finally:
+            cursor.close()
+
+
+def querydb_chunks(query, db_conn, chunksize=100000, as_arrow=False):
+    """Run a query and iterate over the result in chunks instead of loading it all at once.
+
+        Examples:
+            Functional usage
+
+            >>> from bizwiz import dbmanager as db
+            >>> for chunk in db.querydb_chunks('big_pull.sql', 'redshift', chunksize=50000):
+            ...     process(chunk)  # doctest: +SKIP
+
+        Args:
+            query: SQL query string or path to a .sql file
+            db_conn: DB-API connection or DSN name to check out of the connection pool
+            chunksize: Number of rows per chunk. Default is 100000.
+            as_arrow: Set to True to yield pyarrow RecordBatches instead of DataFrames. Default is False.
+
+        Returns:
+            Generator of DataFrames or pyarrow RecordBatches with at most chunksize rows each
+    """
+    query = _read_query(query)
+    schema = None
+
+    for description, rows in _fetch_chunks(query, db_conn, chunksize):
+        if as_arrow == True:
+            if schema is None:
+                schema = _arrow_schema(description, rows)
+            columns = list(zip(*rows))
+            yield pa.RecordBatch.from_arrays(
+                [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+                schema=schema
+            )
+        else:
+            yield pd.DataFrame.from_records(rows, columns=[d[0] for d in description])
+
+
+def query_to_parquet(query, db_conn, parquet_path, chunksize=100000, compression='zstd'):
+    """Stream a query result straight into a parquet file one chunk at a time.
+
+        Examples:
+            Functional usage
+
+            >>> from bizwiz import dbmanager as db
+            >>> db.query_to_parquet('big_pull.sql', 'redshift', 'big_pull.parquet')  # doctest: +SKIP
+
+        Args:
+            query: SQL query string or path to a .sql file
+            db_conn: DB-API connection or DSN name to check out of the connection pool
+            parquet_path: Output parquet file path
+            chunksize: Number of rows fetched and written per row group. Default is 100000.
+            compression: Parquet compression codec. Default is zstd.
+
+        Returns:
+            Number of rows written
+    """
+    writer = None
+    rows_written = 0
+
+    try:
+        for batch in querydb_chunks(query, db_conn, chunksize, as_arrow=True):
+            if writer is None:
+                writer = pq.ParquetWriter(parquet_path, batch.schema, compression=compression)
+            writer.write_batch(batch)
+            rows_written += batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+
+    print(f'{rows_written:,} rows written to {parquet_path}')
+
+    return rows_written
+
+
+def _connection_identity(db_conn):
+    # Returns (identity, persistent). DSN names identify themselves and pyodbc connections report their
+    # data source. Anything else falls back to the object id, which is only meaningful inside this process.
+    if isinstance(db_conn, str):
+        return db_conn, True
+    try:
+        return '|'.join(
+            str(db_conn.getinfo(info)) for info in
+            (pyodbc.SQL_DATA_SOURCE_NAME, pyodbc.SQL_SERVER_NAME, pyodbc.SQL_DATABASE_NAME)
+        ), True
+    except Exception:
+        return f'{type(db_conn).__module__}.{type(db_conn).__name__}:{id(db_conn)}', False
+
+# Keys built from an object id carry this prefix and are never written to or read from disk
+_PROCESS_LOCAL = 'local-'
+
+
+class QueryCache:
+    """Two tier cache of query results keyed on normalized SQL text and connection identity.
+
+        Results are held in an in-memory LRU and, when cache_dir is set, written to parquet files so they
+        survive across processes. Entries older than ttl seconds are treated as misses in both tiers.
+
+        Examples:
+            Functional usage
+
+            >>> from bizwiz import dbmanager as db
+            >>> cache = db.QueryCache(ttl=3600, cache_dir='.query_cache')
+            >>> df = db.querydb('report.sql', 'redshift', cache=cache)  # doctest: +SKIP
+            >>> cache.stats()  # doctest: +SKIP
+
+        Args:
+            ttl: Seconds a cached result stays valid. Default is 3600.
+            max_entries: Maximum number of results kept in memory. Default is 32.
+            cache_dir: Directory for the on-disk parquet tier. Default is None (memory only).
+    """
+
+    def __init__(self, ttl=3600, max_entries=32, cache_dir=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, query, db_conn):
+        normalized = sqlparse.format(_read_query(query), strip_comments=True)
+        normalized = sqlparse.format(normalized, strip_whitespace=True, keyword_case='lower')
+        identity, persistent = _connection_identity(db_conn)
+        digest = hashlib.sha256(f'{identity}\x00{normalized}'.encode('utf-8')).hexdigest()
+        return digest if persistent else f'{_PROCESS_LOCAL}{digest}'
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.parquet')
+
+    def _on_disk(self, key):
+        return self.cache_dir is not None and not key.startswith(_PROCESS_LOCAL)
+
+    def get(self, key):
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[0] <= self.ttl:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[1].copy()
+            self._memory.pop(key, None)
+
+        if self._on_disk(key):
+            path = self._disk_path(key)
+            if os.path.exists(path) and now - os.path.getmtime(path) <= self.ttl:
+                result = pd.read_parquet(path)
+                with self._lock:
+                    self._store(key, os.path.getmtime(path), result)
+                    self.hits += 1
+                return result.copy()
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _store(self, key, created, result):
+        self._memory[key] = (created, result)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def put(self, key, result):
+        with self._lock:
+            self._store(key, time.time(), result.copy())
+
+        if self._on_disk(key):
+            path = self._disk_path(key)
+            temp_path = f'{path}.{os.getpid()}.tmp'
+            try:
+                result.to_parquet(temp_path)
+                os.replace(temp_path, path)
+            except (ValueError, TypeError, pa.ArrowException):
+                # Results parquet cannot hold (e.g. duplicate column names) stay in the memory tier only
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+    def invalidate(self, query=None, db_conn=None):
+        """Drop one cached query, or everything when no query is given."""
+        if query is None:
+            keys = list(self._memory)
+            if self.cache_dir is not None:
+                keys += [f[:-len('.parquet')] for f in os.listdir(self.cache_dir) if f.endswith('.parquet')]
+        else:
+            keys = [self.key(query, db_conn)]
+
+        with self._lock:
+            for k in keys:
+                self._memory.pop(k, None)
+
+        if self.cache_dir is not None:
+            for k in set(keys):
+                if os.path.exists(self._disk_path(k)):
+                    os.remove(self._disk_path(k))
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._memory)}
+
+
+query_cache = QueryCache()
+
+
+def querydb(query, db_conn, chunksize=None, as_arrow=False, cache=None):
+    
+    query = _read_query(query)
+
+    # Chunked mode streams the result instead of materializing it
+    if chunksize is not None:
+        return querydb_chunks(query, db_conn, chunksize, as_arrow)
+
+    # Opt-in result cache, True uses the shared query_cache
+    if cache == True:
+        cache = query_cache
+    if cache is not None:
+        key = cache.key(query, db_conn)
+        result = cache.get(key)
+        if result is not None:
+            return result
+    
+    with _checkout(db_conn) as conn:
+        result = pd.read_sql(query, conn)
+
+    if cache is not None:
+        cache.put(key, result)
     
     return result
     
 
-def create_table_from_df(df, table_name, db_conn):
+def _execute(db_conn, statement):
+    cursor = db_conn.cursor()
+    cursor.execute(statement)
+    cursor.close()
+
+
+def _sql_column_types(df):
+    # Map each dataframe dtype to a warehouse column type; text columns are sized to their longest value
+    # in UTF-8 bytes, as Redshift varchar(n) limits bytes rather than characters
+    column_types = {}
+
+    for col in df.columns:
+        s = df[col]
+
+        if pd.api.types.is_bool_dtype(s):
+            column_types[col] = 'boolean'
+        elif pd.api.types.is_integer_dtype(s):
+            column_types[col] = 'bigint'
+        elif pd.api.types.is_float_dtype(s):
+            column_types[col] = 'double precision'
+        elif pd.api.types.is_datetime64_any_dtype(s):
+            column_types[col] = 'timestamp'
+        else:
+            width = s.dropna().astype(str).str.encode('utf-8').str.len().max()
+            width = 256 if pd.isna(width) else int(min(max(width, 1), 65535))
+            column_types[col] = f'varchar({width})'
+
+    return column_types
+
+
+def _insert_rows(df):
+    # Convert a dataframe slice to DB-API parameter tuples with native python values and None for nulls
+    df = df.copy()
+    for col in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = pd.Series(df[col].dt.to_pydatetime(), index=df.index, dtype=object)
+    df = df.astype(object).where(df.notna(), None)
+    return list(df.itertuples(index=False, name=None))
+
+
+def create_table_from_df(df, table_name, db_conn, batch_size=10000, column_types=None, verbose=True):
+
+    if isinstance(db_conn, str):
+        with _checkout(db_conn) as conn:
+            return create_table_from_df(df, table_name, conn, batch_size, column_types, verbose)
     
     # Drop The Existing Table
     drop_table = f'drop table if exists {table_name};'
-    pd.io.sql.execute(drop_table, db_conn)
+    _execute(db_conn, drop_table)
     print(table_name + ': Drop Completed')
     
     # Clean dataframe names
     df = clean_names(df)
-    value_list = [str(x) for x in df.values.tolist()]
-    
-    # Clean columns
-    columns = [str(x) for x in df.columns.tolist()]
-    
-    list(df.columns)
-    columns = str(columns)
-    
-    columns = (
-        columns
-        .replace("',"," varchar(1000),")
-        .replace("']"," varchar(1000)")
-        .replace("[","")
-        .replace("]","")
-        .replace("'","")
-        )
+
+    # Infer column types from the dataframe, allowing explicit overrides
+    types = _sql_column_types(df)
+    if column_types is not None:
+        types.update(column_types)
+    columns = ', '.join(f'{col} {types[col]}' for col in df.columns)
     
     # Create table
     create_table = f'create table if not exists {table_name}({columns});'
-    pd.io.sql.execute(create_table, db_conn)
+    _execute(db_conn, create_table)
     print(table_name + ': created successfully')
     
-    # Insert in chunks
-    step = 10000
-
-    def clean_value(v):
-        v = (
-            v
-            .replace('[', '(')
-            .replace(']', ')')
-            .replace('((', '(')
-            .replace('))', ')')
-        )
-        return v
-    
-    value_list = [clean_value(x) for x in value_list]
+    # Insert in parameterized batches
+    placeholders = ', '.join('?' for _ in df.columns)
+    insert_statement = f'insert into {table_name} ({", ".join(df.columns)}) values ({placeholders})'
 
-    
-    for i in range( 0, len(value_list) ):
-        x=i
-        res = value_list[x:x+step]
-        insert_statement = f'insert into {table_name} values {res}'
-        x=str(insert_statement)
+    cursor = db_conn.cursor()
+    if hasattr(cursor, 'fast_executemany'):
+        cursor.fast_executemany = True
 
-        pd.io.sql.execute(x, db_conn)
-        
-        print(table_name + ' : rows inserted')
-        
-    def create_aws_table(df, table_name, db_conn,grant_table_access = False, aws_group=False):
+    total_rows = len(df)
+    inserted = 0
+    start = time.perf_counter()
+
+    for i in range(0, total_rows, batch_size):
+        rows = _insert_rows(df.iloc[i:i + batch_size])
+        cursor.executemany(insert_statement, rows)
+        inserted += len(rows)
+
+        if verbose == True:
+            elapsed = time.perf_counter() - start
+            rate = inserted / elapsed if elapsed > 0 else float('inf')
+            print(f'{table_name}: {inserted:,} of {total_rows:,} rows inserted ({rate:,.0f} rows/s)')
+
+    cursor.close()
+    db_conn.commit()
+
+    elapsed = time.perf_counter() - start
+    print(f'{table_name}: {inserted:,} rows inserted in {elapsed:.2f}s')
+
+    return inserted
+
+
+def create_aws_table(df, table_name, db_conn, grant_table_access = False, aws_group=False, **kwargs):
 
-        create_table_from_df(df, table_name, db_conn)
+    with _checkout(db_conn) as conn:
+        create_table_from_df(df, table_name, conn, **kwargs)
 
         if grant_table_access != False:
             grant = f'grant all on table {table_name} to group {aws_group}'
-            pd.io.sql.execute(grant, db_conn)
+            _execute(conn, grant)
+            conn.commit()
             print('grant statement run')
-        
\ No newline at end of file
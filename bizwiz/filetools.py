@@ -1,87 +1,799 @@
+import pandas_flavor as pf
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import janitor
+import duckdb
+import codecs
+import io
+import os
+import threading
+import time
+import uuid
+import warnings
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from fnmatch import fnmatch
+from functools import lru_cache
 
 
+_BOMS = [
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
 
+@lru_cache(maxsize=1024)
+def _sample_encoding(path, mtime_ns, size, sample_size):
+    # Cached per path and file version so a file is only sampled once until it changes
+    with open(path, 'rb') as f:
+        sample = f.read(sample_size)
 
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding
 
-def __csv_read(path, **kwargs):
-    csv_encodings = ['utf-8', 'utf-8-sig', 'iso-8859-1', 'latin1', 'cpl1252']
-    
-    for e in csv_encodings:
-        try:
-            temp = (
-                 pd.read_csv(path, encoding=e, engine='pyarrow',dtype_backend='pyarrow', **kwargs)
-                 .clean_names()
-                 .remove_empty
-            )
-        
-        except Exception as e:
-            pass
+    # The incremental decoder tolerates a multibyte character cut off at the end of the sample
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+
+    # Lines with valid multibyte utf-8 mean the file is utf-8 with some rows in another encoding,
+    # which __csv_read handles with its per line fallback
+    for line in sample.splitlines():
+        if not line.isascii():
+            try:
+                line.decode('utf-8')
+                return 'utf-8'
+            except UnicodeDecodeError:
+                pass
+
+    try:
+        sample.decode('cp1252')
+        return 'cp1252'
+    except UnicodeDecodeError:
+        return 'latin1'
+
+def detect_encoding(path, sample_size=65536):
+    """Detect a text file's encoding from a byte sample, checking for a byte order mark first.
+
+        Args:
+            path: File path
+            sample_size: Number of leading bytes inspected. Default is 65536.
+
+        Returns:
+            Codec name: utf-8-sig, utf-16 or utf-32 when a BOM is present, otherwise utf-8, cp1252 or latin1
+    """
+    stat = os.stat(path)
+    return _sample_encoding(os.path.abspath(path), stat.st_mtime_ns, stat.st_size, sample_size)
+
+def _decode_mixed(path, encoding, fallback_encoding):
+    # Decode line by line so rows written in a different encoding do not corrupt the rest of the file
+    lines = []
+    fallback_lines = 0
+
+    with open(path, 'rb') as f:
+        for line in f:
+            try:
+                lines.append(line.decode(encoding))
+            except UnicodeDecodeError:
+                lines.append(line.decode(fallback_encoding, errors='replace'))
+                fallback_lines += 1
+
+    return ''.join(lines), fallback_lines
+
+def __csv_read(path, encoding=None, fallback_encoding='cp1252', **kwargs):
+    encoding = detect_encoding(path) if encoding is None else encoding
+
+    temp = pd.read_csv(path, encoding=encoding, engine='pyarrow', dtype_backend='pyarrow', **kwargs)
+
+    # pyarrow keeps undecodable text columns as binary rather than raising, which signals mixed encodings
+    binary_columns = [
+        col for col, dtype in temp.dtypes.items()
+        if isinstance(dtype, pd.ArrowDtype) and pa.types.is_binary(dtype.pyarrow_dtype)
+    ]
+
+    if binary_columns:
+        text, fallback_lines = _decode_mixed(path, encoding, fallback_encoding)
+        warnings.warn(
+            f'{path}: {fallback_lines} rows are not valid {encoding} and were decoded as {fallback_encoding}'
+        )
+        temp = pd.read_csv(
+            io.BytesIO(text.encode('utf-8')), encoding='utf-8', engine='pyarrow', dtype_backend='pyarrow', **kwargs
+        )
+
+    temp = temp.clean_names().remove_empty()
         
     return temp
 
 def __xl_read(path, **kwargs):
     temp =(
-        pd.read_excel(path, dtype_backend='arrow', **kwargs)
+        pd.read_excel(path, dtype_backend='pyarrow', **kwargs)
         .clean_names()
         .remove_empty()
         )
     return temp
 
+def _bulk_read(reader, file_paths, parallel=None, max_workers=None, source_column=None, **kwargs):
+    # Read every file with the reader, optionally across a thread or process pool, collecting failures per file
+    frames = {}
+    failures = {}
+
+    if parallel is None:
+        for f in file_paths:
+            try:
+                frames[f] = reader(f, **kwargs)
+            except Exception as e:
+                failures[f] = e
+    else:
+        pools = {'thread': ThreadPoolExecutor, 'process': ProcessPoolExecutor}
+        with pools[parallel](max_workers=max_workers) as executor:
+            futures = {executor.submit(reader, f, **kwargs): f for f in file_paths}
+            for future in as_completed(futures):
+                f = futures[future]
+                try:
+                    frames[f] = future.result()
+                except Exception as e:
+                    failures[f] = e
+
+    for f, e in failures.items():
+        print(f'Failed to read {f}: {e!r}')
+
+    # Keep the input order regardless of completion order
+    frames = [(f, frames[f]) for f in file_paths if f in frames]
+
+    if source_column is not None:
+        for f, df in frames:
+            df[source_column] = f
+
+    return [df for _, df in frames], failures
+
+def _align_dtypes(frames):
+    # Columns whose type differs between files are cast to one unified Arrow type (string when the types
+    # cannot be promoted), and columns a file lacks are filled with typed nulls, so the concat is not object
+    schemas = [pa.Schema.from_pandas(df, preserve_index=False).remove_metadata() for df in frames]
+    schema = schemas[0]
+    for other in schemas[1:]:
+        schema = _unify_schemas(schema, other)
+
+    mismatched = [
+        field for field in schema
+        if any(field.name not in s.names or s.field(field.name).type != field.type for s in schemas)
+    ]
+    if not mismatched:
+        return frames
+
+    aligned = []
+    for df in frames:
+        df = df.copy()
+        for field in mismatched:
+            if field.name in df.columns:
+                values = pa.array(df[field.name], from_pandas=True).cast(field.type)
+            else:
+                values = pa.nulls(len(df), type=field.type)
+            df[field.name] = pd.Series(values, index=df.index, dtype=pd.ArrowDtype(field.type))
+        aligned.append(df)
+    return aligned
+
+def _concat_aligned(frames, failures):
+    # Single concat over the union of columns in first seen order
+    columns = list(dict.fromkeys(col for df in frames for col in df.columns))
+    if frames:
+        result = pd.concat([df.reindex(columns=columns) for df in _align_dtypes(frames)], ignore_index=True)
+    else:
+        result = pd.DataFrame()
+    result.attrs['failed_files'] = {f: repr(e) for f, e in failures.items()}
+    return result
+
 def bulk_read_excel(
           file_path_list: list, 
           concat: bool=True,  
+          parallel: str=None,
+          max_workers: int=None,
+          source_column: str=None,
           **kwargs
         ):
+    """Read a list of excel files into one dataframe or a tuple of dataframes.
+
+        Examples:
+            Functional usage
+
+            >>> from bizwiz import filetools as ft
+            >>> df = ft.bulk_read_excel(
+            ...     file_path_list = glob.glob('drop/*.xlsx'),
+            ...     parallel = 'process',
+            ...     source_column = 'source_file'
+            ... )  # doctest: +SKIP
+
+        Args:
+            file_path_list: List of file paths. Non excel files are skipped.
+            concat: Set to True to return a single concatenated dataframe. Default is True.
+            parallel: Read files concurrently with a 'thread' or 'process' pool. Default is None (serial).
+            max_workers: Number of pool workers. Default is None (executor default).
+            source_column: Column name to record each row's source file path. Default is None (not added).
+            **kwargs: Passed through to pd.read_excel
+
+        Returns:
+            Concatenated DataFrame (failed files listed in result.attrs['failed_files']) or a tuple of DataFrames
+    """
     
-    xlsx_files = [f for f in file_path_list if fnmatch(f, '*.xls?')]
+    xlsx_files = [f for f in file_path_list if fnmatch(f, '*.xls*')]
+    frames, failures = _bulk_read(__xl_read, xlsx_files, parallel, max_workers, source_column, **kwargs)
     
     if concat==True:  
-        result = pd.concat([__xl_read(f, **kwargs) for f in xlsx_files])
-    
-    elif concat == False:
-        result, *other = map(__xl_read, file_path_list)
+        return _concat_aligned(frames, failures)
     
-    return (result, *other)
+    return tuple(frames)
 
     
-def bulk_read_csv(file_path_list, concat=True, **kwargs):
+def bulk_read_csv(file_path_list, concat=True, parallel=None, max_workers=None, source_column=None, **kwargs):
+    """Read a list of csv files into one dataframe or a tuple of dataframes.
+
+        Examples:
+            Functional usage
+
+            >>> from bizwiz import filetools as ft
+            >>> df = ft.bulk_read_csv(
+            ...     file_path_list = glob.glob('drop/*.csv'),
+            ...     parallel = 'thread',
+            ...     max_workers = 8
+            ... )  # doctest: +SKIP
+
+        Args:
+            file_path_list: List of file paths. Non csv files are skipped.
+            concat: Set to True to return a single concatenated dataframe. Default is True.
+            parallel: Read files concurrently with a 'thread' or 'process' pool. Default is None (serial).
+            max_workers: Number of pool workers. Default is None (executor default).
+            source_column: Column name to record each row's source file path. Default is None (not added).
+            **kwargs: Passed through to pd.read_csv
+
+        Returns:
+            Concatenated DataFrame (failed files listed in result.attrs['failed_files']) or a tuple of DataFrames
+    """
     
     csv_files = [file for file in file_path_list if fnmatch(file, '*.csv')]
+    frames, failures = _bulk_read(__csv_read, csv_files, parallel, max_workers, source_column, **kwargs)
     
     if concat==True:
-        
-        result = pd.concat([__csv_read(f, **kwargs) for f in csv_files])
-        
-    elif concat == False:
-        
-        result, *other = map(__csv_read, file_path_list)
+        return _concat_aligned(frames, failures)
     
-    return (result, *other)
+    return tuple(frames)
 
 
-def query_parquet(sql_query, parquet_path):
-   
-        sql_query = sql_query.lower()
-        start = re.findall(r'select.+?from', sql_query)
-        end = re.findall(r'(where.*)', sql_query)
-        query = " ".join(start) + f" read_parquet({parquet_path}) " + " ".join(end) 
-        df = duckdb.query(query).to_df()  
-        return df
+def _iter_read(reader, file_paths, source_column=None, **kwargs):
+    # Read one file at a time so only a single frame is held in memory
+    for f in file_paths:
+        try:
+            df = reader(f, **kwargs)
+        except Exception as e:
+            print(f'Failed to read {f}: {e!r}')
+            continue
+
+        if source_column is not None:
+            df[source_column] = f
+
+        yield f, df
+
+def iter_read_csv(file_path_list, source_column=None, **kwargs):
+    """Lazily read csv files one at a time.
+
+        Examples:
+            Functional usage
+
+            >>> from bizwiz import filetools as ft
+            >>> for path, df in ft.iter_read_csv(glob.glob('drop/*.csv')):
+            ...     process(df)  # doctest: +SKIP
+
+        Args:
+            file_path_list: List of file paths. Non csv files are skipped.
+            source_column: Column name to record each row's source file path. Default is None (not added).
+            **kwargs: Passed through to pd.read_csv
+
+        Returns:
+            Generator of (file path, DataFrame) tuples. Files that fail to read are reported and skipped.
+    """
+    csv_files = [file for file in file_path_list if fnmatch(file, '*.csv')]
+    return _iter_read(__csv_read, csv_files, source_column, **kwargs)
+
+def iter_read_excel(file_path_list, source_column=None, **kwargs):
+    """Lazily read excel files one at a time.
+
+        Args:
+            file_path_list: List of file paths. Non excel files are skipped.
+            source_column: Column name to record each row's source file path. Default is None (not added).
+            **kwargs: Passed through to pd.read_excel
+
+        Returns:
+            Generator of (file path, DataFrame) tuples. Files that fail to read are reported and skipped.
+    """
+    xlsx_files = [f for f in file_path_list if fnmatch(f, '*.xls*')]
+    return _iter_read(__xl_read, xlsx_files, source_column, **kwargs)
+
+def _unify_schemas(schema, new_schema):
+    # Permissive promotion (e.g. int64 + double), falling back to string for columns whose types cannot be merged
+    try:
+        return pa.unify_schemas([schema, new_schema], promote_options='permissive')
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        fields = {f.name: f for f in schema}
+        for f in new_schema:
+            if f.name not in fields:
+                fields[f.name] = f
+            elif fields[f.name].type != f.type:
+                fields[f.name] = pa.field(f.name, pa.string())
+        return pa.schema(list(fields.values()))
+
+def _remove_dataset_parts(output_directory):
+    # Parts left by an earlier run would otherwise be read back alongside the new ones
+    for root, _, files in os.walk(output_directory):
+        for name in files:
+            if fnmatch(name, 'part-[0-9][0-9][0-9][0-9][0-9]-*.parquet') or name == '_common_metadata':
+                os.remove(os.path.join(root, name))
+
+def bulk_to_parquet_dataset(
+        file_path_list: list,
+        output_directory: str,
+        partition_cols: list=None,
+        file_type: str='csv',
+        source_column: str=None,
+        compression: str='zstd',
+        **kwargs
+    ):
+    """Stream csv or excel files into a parquet dataset without holding more than one file in memory.
+
+        Each file is written as its own part (split by partition_cols when given), cast to the unified schema across
+        all files, so the dataset reads back with standard readers. Earlier parts are rewritten when a later file
+        widens the schema, and columns missing from a file are written as nulls. Parts from a previous run into
+        the same output_directory are removed first. The unified schema is also written to _common_metadata.
+
+        Examples:
+            Functional usage
+
+            >>> import pyarrow.dataset as ds
+            >>> from bizwiz import filetools as ft
+            >>> schema = ft.bulk_to_parquet_dataset(
+            ...     file_path_list = glob.glob('drop/*.csv'),
+            ...     output_directory = 'warehouse/daily',
+            ...     partition_cols = ['region']
+            ... )  # doctest: +SKIP
+            >>> ds.dataset('warehouse/daily', partitioning='hive').to_table()  # doctest: +SKIP
+
+        Args:
+            file_path_list: List of file paths
+            output_directory: Root directory of the parquet dataset
+            partition_cols: Columns to hive partition the dataset by. Default is None (no partitioning).
+            file_type: Either csv or excel. Default is csv.
+            source_column: Column name to record each row's source file path. Default is None (not added).
+            compression: Parquet compression codec. Default is zstd.
+            **kwargs: Passed through to the file reader
+
+        Returns:
+            Unified pyarrow schema of the dataset
+    """
+    readers = {'csv': iter_read_csv, 'excel': iter_read_excel}
+    partition_cols = partition_cols or []
+    schema = None
+    files_written = 0
+    written = []
+
+    os.makedirs(output_directory, exist_ok=True)
+    _remove_dataset_parts(output_directory)
+
+    for i, (f, df) in enumerate(readers[file_type](file_path_list, source_column, **kwargs)):
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        new_schema = table.schema.remove_metadata() if schema is None else _unify_schemas(schema, table.schema.remove_metadata())
+
+        # Parts already on disk are re-cast whenever the schema widens, so every file shares one schema
+        if schema is not None and not new_schema.equals(schema):
+            file_schema = pa.schema([field for field in new_schema if field.name not in partition_cols])
+            for path in written:
+                part = _conform_schema(pq.ParquetFile(path).read(), file_schema)
+                pq.write_table(part, f'{path}.tmp', compression=compression)
+                os.replace(f'{path}.tmp', path)
+        schema = new_schema
+
+        pq.write_to_dataset(
+            _conform_schema(table, schema),
+            output_directory,
+            partition_cols=partition_cols or None,
+            basename_template=f'part-{i:05d}-{{i}}.parquet',
+            compression=compression,
+            existing_data_behavior='overwrite_or_ignore',
+            file_visitor=lambda written_file: written.append(written_file.path)
+        )
+        files_written += 1
+
+    if schema is None:
+        print('No files written')
+        return None
+
+    schema = schema.remove_metadata()
+    pq.write_metadata(schema, os.path.join(output_directory, '_common_metadata'))
+
+    print(f'{files_written} files written to {output_directory}')
+
+    return schema
+
+def _quote_identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+def _parquet_source(path):
+    # Directories are scanned recursively, files and globs are passed to read_parquet as given
+    paths = [path] if isinstance(path, str) else list(path)
+    paths = [os.path.join(p, '**', '*.parquet') if os.path.isdir(p) else p for p in paths]
+    return '[' + ', '.join("'" + p.replace("'", "''") + "'" for p in paths) + ']'
+
+class ParquetEngine:
+    """Persistent DuckDB connection that exposes parquet files, globs and directories as named views.
+
+        SQL is passed to DuckDB untouched, so joins, aggregations and string literals behave as written and
+        DuckDB pushes column projections and filters down into the parquet scan.
+
+        Examples:
+            Functional usage
+
+            >>> from bizwiz import filetools as ft
+            >>> engine = ft.ParquetEngine()
+            >>> engine.register('sales', 'warehouse/sales/')
+            >>> engine.register('regions', 'regions.parquet')
+            >>> df = engine.query(
+            ...     'select r.name, sum(s.amount) as total from sales s join regions r using (region_id) '
+            ...     'where s.sale_date >= ? group by r.name',
+            ...     params = ['2024-01-01']
+            ... )  # doctest: +SKIP
+
+        Args:
+            database: DuckDB database path. Default is :memory:.
+            threads: Number of DuckDB worker threads. Default is None (DuckDB default).
+    """
+
+    def __init__(self, database=':memory:', threads=None):
+        self.con = duckdb.connect(database)
+        self.views = {}
+        self._lock = threading.Lock()
+
+        if threads is not None:
+            self.con.execute(f'set threads = {int(threads)}')
+
+    @staticmethod
+    def _view_sql(name, source, hive_partitioning, union_by_name, temporary=False):
+        return (
+            f'create or replace {"temp " if temporary else ""}view {_quote_identifier(name)} as select * from read_parquet('
+            f'{source}, hive_partitioning = {str(hive_partitioning).lower()}, '
+            f'union_by_name = {str(union_by_name).lower()})'
+        )
+
+    def register(self, name, parquet_path, hive_partitioning=True, union_by_name=True):
+        source = _parquet_source(parquet_path)
+
+        with self._lock:
+            if self.views.get(name) != source:
+                cursor = self.con.cursor()
+                try:
+                    cursor.execute(self._view_sql(name, source, hive_partitioning, union_by_name))
+                finally:
+                    cursor.close()
+                self.views[name] = source
+
+        return self
+
+    def query(self, sql_query, params=None, output='pandas', views=None):
+        # DuckDB connections are not thread safe, so each query runs on its own cursor. Views passed here are
+        # temporary to that cursor, so concurrent callers never re-point each other's tables.
+        cursor = self.con.cursor()
+        try:
+            for name, parquet_path in (views or {}).items():
+                cursor.execute(self._view_sql(name, _parquet_source(parquet_path), True, True, temporary=True))
+
+            result = cursor.execute(sql_query, params)
+
+            if output == 'arrow':
+                table = result.arrow()
+                if isinstance(table, pa.RecordBatchReader):
+                    table = table.read_all()
+                return table
+
+            return result.df()
+        finally:
+            cursor.close()
+
+    def close(self):
+        self.con.close()
+        self.views = {}
+
+_parquet_engine = None
+
+def _default_engine():
+    global _parquet_engine
+    if _parquet_engine is None:
+        _parquet_engine = ParquetEngine()
+    return _parquet_engine
+
+def query_parquet(sql_query, parquet_path, table_name='parquet_data', params=None, output='pandas', engine=None):
+    """Run SQL against parquet data using a persistent DuckDB engine.
+
+        Examples:
+            Functional usage
+
+            >>> from bizwiz import filetools as ft
+            >>> df = ft.query_parquet(
+            ...     "select region, count(*) as n from parquet_data where status = ? group by region",
+            ...     'warehouse/orders/*.parquet',
+            ...     params = ['Shipped']
+            ... )  # doctest: +SKIP
+
+        Args:
+            sql_query: SQL query referencing table_name (or the keys of parquet_path when it is a dict)
+            parquet_path: Parquet file, glob, directory or list of them, or a dict of view name to path
+            table_name: View name the parquet_path is registered under. Default is parquet_data.
+            params: Values bound to ? placeholders in the query. Default is None.
+            output: Either pandas or arrow. Default is pandas.
+            engine: ParquetEngine to use. Default is None (shared module engine).
+
+        Returns:
+            DataFrame or pyarrow Table with the query result
+    """
+    engine = _default_engine() if engine is None else engine
+    sources = parquet_path if isinstance(parquet_path, dict) else {table_name: parquet_path}
+
+    return engine.query(sql_query, params, output, views=sources)
     
-def export_multi_parquet(output_directory, df_names, file_path_list = None):
-        for f in file_path_list:
-            fp = f"{output_directory}{os.path.splitext(f)[0]}.parquet"
-            for df in df_names:
-                df.write_parquet(fp, compression='zstd')
-        return print('Parquet Files Created')
+def _to_arrow(df):
+    # pandas frames go through from_pandas, polars frames and arrow tables are already arrow backed
+    if isinstance(df, pa.Table):
+        return df
+    if isinstance(df, pd.DataFrame):
+        return pa.Table.from_pandas(df, preserve_index=False)
+    return df.to_arrow()
+
+def _write_parquet_file(df, path, **write_options):
+    table = _to_arrow(df)
+    pq.write_table(table, path, **write_options)
+    return {
+        'path': path,
+        'rows': table.num_rows,
+        'bytes': os.path.getsize(path),
+        'row_groups': pq.ParquetFile(path).metadata.num_row_groups,
+    }
+
+def export_multi_parquet(
+        output_directory,
+        df_names,
+        file_path_list=None,
+        max_workers=None,
+        row_group_size=None,
+        compression='zstd',
+        compression_level=None,
+        use_dictionary=True,
+        write_statistics=True
+    ):
+    """Write each dataframe to its own parquet file concurrently.
+
+        Examples:
+            Functional usage
+
+            >>> from bizwiz import filetools as ft
+            >>> manifest = ft.export_multi_parquet(
+            ...     output_directory = 'exports',
+            ...     df_names = [sales, returns],
+            ...     file_path_list = ['sales.csv', 'returns.csv'],
+            ...     row_group_size = 500000,
+            ...     compression_level = 9
+            ... )  # doctest: +SKIP
+
+        Args:
+            output_directory: Directory the parquet files are written to
+            df_names: List of pandas DataFrames, polars DataFrames or pyarrow Tables
+            file_path_list: Source file names, one per dataframe, used to name the outputs. Base names must be unique. Default is None (part-00000.parquet, ...).
+            max_workers: Number of writer threads. Default is None (executor default).
+            row_group_size: Maximum rows per row group. Default is None (pyarrow default).
+            compression: Parquet compression codec. Default is zstd.
+            compression_level: Codec compression level. Default is None (codec default).
+            use_dictionary: Dictionary encode columns. True, False or a list of column names. Default is True.
+            write_statistics: Write column statistics. True, False or a list of column names. Default is True.
+
+        Returns:
+            DataFrame manifest with the path, rows, bytes and row groups of each file written
+    """
+    if file_path_list is None:
+        file_path_list = [f'part-{i:05d}' for i in range(len(df_names))]
 
+    if len(file_path_list) != len(df_names):
+        raise ValueError(f'{len(df_names)} dataframes given for {len(file_path_list)} file paths')
+
+    output_paths = [
+        os.path.join(output_directory, f'{os.path.splitext(os.path.basename(f))[0]}.parquet') for f in file_path_list
+    ]
+
+    # Files are written concurrently, so two inputs sharing a name would overwrite each other
+    duplicates = sorted({p for p in output_paths if output_paths.count(p) > 1})
+    if duplicates:
+        raise ValueError(f'Output paths are not unique: {duplicates}')
+
+    os.makedirs(output_directory, exist_ok=True)
+
+    write_options = {
+        'row_group_size': row_group_size,
+        'compression': compression,
+        'compression_level': compression_level,
+        'use_dictionary': use_dictionary,
+        'write_statistics': write_statistics,
+    }
+
+    # pyarrow releases the GIL while encoding and compressing, so threads write in parallel
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        manifest = list(executor.map(
+            lambda item: _write_parquet_file(item[0], item[1], **write_options), zip(df_names, output_paths)
+        ))
+
+    manifest = pd.DataFrame(manifest)
+    print(f'{len(manifest)} parquet files created ({manifest["rows"].sum():,} rows, {manifest["bytes"].sum():,} bytes)')
+
+    return manifest
+
+
+_part_lock = threading.Lock()
+_last_part_ns = 0
+
+def _part_name():
+    # Readers order parts by name, so names lead with a strictly increasing nanosecond timestamp
+    global _last_part_ns
+    with _part_lock:
+        _last_part_ns = max(time.time_ns(), _last_part_ns + 1)
+        prefix = f'{_last_part_ns:020d}'
+    return f'part-{prefix}-{uuid.uuid4().hex[:8]}.parquet'
+
+def _dataset_files(parquet_path):
+    return sorted(
+        os.path.join(parquet_path, f) for f in os.listdir(parquet_path)
+        if f.endswith('.parquet') and not f.startswith(('_', '.'))
+    )
+
+def _conform_schema(table, schema):
+    # Cast the new rows to the dataset schema, filling columns the new data lacks with nulls
+    extra = [name for name in table.column_names if name not in schema.names]
+    if extra:
+        raise ValueError(f'Columns not in the existing parquet schema: {extra}')
+
+    columns = []
+    for field in schema:
+        if field.name in table.column_names:
+            column = table.column(field.name)
+            if column.type != field.type:
+                try:
+                    column = column.cast(field.type)
+                except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+                    raise ValueError(
+                        f'Column {field.name} has type {column.type}, which is incompatible with {field.type}'
+                    ) from e
+            columns.append(column)
+        else:
+            columns.append(pa.nulls(table.num_rows, type=field.type))
+
+    return pa.Table.from_arrays(columns, schema=schema)
 
 @pf.register_dataframe_method
-def append_parquet(df, parquet_path):
-        pq = pd.read_parquet(parquet_path)
-        pqf = pd.concat([pq, df])
-        pqf.write_parquet(parquet_path, compression = 'zstd')
-        return print("New Data Appended to {}".format(parquet_path)) 
+def append_parquet(df, parquet_path, compression='zstd'):
+        """Append rows to a parquet dataset directory by writing a new part file.
+
+            Existing data is never re-read or rewritten. A legacy single parquet file at parquet_path is
+            converted in place into a dataset directory on first append. New rows are validated and cast
+            against the existing schema. Use compact_parquet to merge accumulated small part files.
+
+            Examples:
+                Functional usage
+
+                >>> import pandas as pd
+                >>> from bizwiz import filetools as ft
+                >>> df.append_parquet('warehouse/daily_sales')  # doctest: +SKIP
+
+            Args:
+                df: DataFrame containing the rows to append
+                parquet_path: Dataset directory, or a single parquet file to convert into one
+                compression: Parquet compression codec. Default is zstd.
+
+            Returns:
+                Path of the part file written
+        """
+        table = pa.Table.from_pandas(df, preserve_index=False)
+
+        if os.path.isfile(parquet_path):
+            temp_path = f'{parquet_path}.{uuid.uuid4().hex[:8]}.tmp'
+            os.replace(parquet_path, temp_path)
+            os.makedirs(parquet_path)
+            os.replace(temp_path, os.path.join(parquet_path, 'part-00000.parquet'))
+
+        os.makedirs(parquet_path, exist_ok=True)
+        existing = _dataset_files(parquet_path)
+
+        if existing:
+            schema = pq.read_schema(existing[0]).remove_metadata()
+            table = _conform_schema(table.replace_schema_metadata(None), schema)
+
+        part_path = os.path.join(parquet_path, _part_name())
+        pq.write_table(table, part_path, compression=compression)
+        print("New Data Appended to {}".format(parquet_path))
+
+        return part_path
+
+def compact_parquet(parquet_path, small_file_bytes=64 * 1024 ** 2, target_rows=1000000, compression='zstd'):
+    """Merge small part files of a parquet dataset directory into larger files.
+
+        Examples:
+            Functional usage
+
+            >>> from bizwiz import filetools as ft
+            >>> ft.compact_parquet('warehouse/daily_sales')  # doctest: +SKIP
+
+        Args:
+            parquet_path: Dataset directory written by append_parquet
+            small_file_bytes: Consecutive files below this size are merged. Default is 64MB.
+            target_rows: Maximum rows per compacted file. Default is 1,000,000.
+            compression: Parquet compression codec. Default is zstd.
+
+        Returns:
+            List of the compacted files written
+    """
+    # Only contiguous runs of small files are merged, so the row order of the dataset is preserved
+    runs, run = [], []
+    for f in _dataset_files(parquet_path):
+        if os.path.getsize(f) < small_file_bytes:
+            run.append(f)
+        else:
+            runs.append(run)
+            run = []
+    runs = [run for run in runs + [run] if len(run) > 1]
+    small_files = [f for run in runs for f in run]
+
+    if not small_files:
+        print('Nothing to compact')
+        return []
+
+    schema = pq.read_schema(small_files[0]).remove_metadata()
+    written = []
+
+    # Stream record batches so memory stays bounded by the batch size, rolling over at target_rows
+    try:
+        for run in runs:
+            # Compacted files extend the run's last file name with -cNNNNN. As '-' sorts before '.parquet', each
+            # one sorts after every file before the run and before the file that followed it, and the name is
+            # unique because no other file can already extend the name of a file that still exists.
+            stem = os.path.splitext(os.path.basename(run[-1]))[0]
+            run_written = 0
+            writer = None
+            rows_in_file = 0
+            try:
+                for f in run:
+                    for batch in pq.ParquetFile(f).iter_batches():
+                        batch = _conform_schema(pa.Table.from_batches([batch]).replace_schema_metadata(None), schema)
+                        if writer is None or rows_in_file >= target_rows:
+                            if writer is not None:
+                                writer.close()
+                            written.append(os.path.join(parquet_path, f'{stem}-c{run_written:05d}.parquet'))
+                            run_written += 1
+                            writer = pq.ParquetWriter(written[-1], schema, compression=compression)
+                            rows_in_file = 0
+                        writer.write_table(batch)
+                        rows_in_file += batch.num_rows
+            finally:
+                if writer is not None:
+                    writer.close()
+    except BaseException:
+        # Partial output would duplicate the rows still held in the originals
+        for f in written:
+            if os.path.exists(f):
+                os.remove(f)
+        raise
+
+    # Only remove the originals once every compacted file is complete
+    for f in small_files:
+        os.remove(f)
+
+    print(f'{len(small_files)} files compacted into {len(written)} in {parquet_path}')
+
+    return written
 
 def export_multi_sheet_excel(df_to_sheet_dict, workbook_name = 'new_workbook.xlsx'):
     wb = xw.Book(workbook_name)